@@ -44,10 +44,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +85,23 @@ DATABASES = {
     }
 }
 
+# User-keyed sharding (core.sharding)
+# Events, tasks and their rollups live on the owning user's shard; everything
+# else stays on "default", which is also the first shard. CALENDRY_SHARDS=N
+# adds N-1 local SQLite shards. Run `manage.py migrate_shards` after changing it.
+
+SHARD_COUNT = int(os.environ.get('CALENDRY_SHARDS', 1))
+
+for index in range(1, SHARD_COUNT):
+    DATABASES[f'shard_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard_{index}.sqlite3',
+    }
+
+USER_SHARDS = ['default'] + [f'shard_{index}' for index in range(1, SHARD_COUNT)]
+
+DATABASE_ROUTERS = ['core.sharding.UserShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -103,9 +122,76 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+#
+# The first hasher is used for new passwords. Stored hashes made with any
+# hasher below it (or with fewer iterations) still verify, and Django
+# transparently re-hashes them with the first entry on the next successful
+# login, so raising the cost only needs a new class at the top of this list.
+
+PASSWORD_HASHERS = [
+    'core.hashers.CalendryPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 1_000_000))
+
+
 AUTH_USER_MODEL = 'core.User'
 
 
+# Cache and sessions
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/#using-cached-sessions
+
+# Cached sessions, cached request.user (core.middleware.CachedAuthenticationMiddleware)
+# and the shard map all need a cache that every worker process shares, so
+# invalidations reach all of them. Set CALENDRY_REDIS_URL (needs the "redis"
+# package) or CALENDRY_MEMCACHED_LOCATION (needs "pymemcache"). Without one,
+# nothing is cached: request.user and sessions are read from the database by
+# the stock middleware and session engine.
+if os.environ.get('CALENDRY_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CALENDRY_REDIS_URL'],
+            'KEY_PREFIX': 'calendry',
+        }
+    }
+elif os.environ.get('CALENDRY_MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['CALENDRY_MEMCACHED_LOCATION'],
+            'KEY_PREFIX': 'calendry',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    }
+
+SHARED_CACHE = CACHES['default']['BACKEND'] != 'django.core.cache.backends.dummy.DummyCache'
+
+if SHARED_CACHE:
+    # Sessions are read from the cache and only fall back to the django_session
+    # table on a miss; writes still go through to the database.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    MIDDLEWARE[MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware')] = (
+        'core.middleware.CachedAuthenticationMiddleware'
+    )
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# How long core.middleware.CachedAuthenticationMiddleware keeps a user around.
+# Entries are dropped early whenever the user row is saved or deleted.
+USER_CACHE_TIMEOUT = 60 * 15
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -122,13 +208,62 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [os.path.join(BASE_DIR, 'core/static')]
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies plus a staticfiles.json manifest,
+# and precompressed .gz/.br siblings that core.middleware.StaticFilesMiddleware
+# serves with immutable cache headers.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# User uploads (profile pictures and their resized variants)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Threads in the local pool that decodes uploads and writes resized variants.
+PROFILE_PICTURE_WORKERS = 2
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Events API limits (core.views.get_events / stream_events)
+
+EVENTS_MAX_WINDOW_DAYS = 400
+EVENTS_PAGE_SIZE = 200
+EVENTS_STREAM_CHUNK_SIZE = 500
+
+# Seconds each process keeps shared holiday calendars in memory (core.holidays);
+# regions loaded with `manage.py load_holidays` show up in other processes
+# after at most this long.
+HOLIDAY_CACHE_TIMEOUT = 60 * 10
+
+# On-demand request profiling (core.middleware.ProfilingMiddleware)
+# Staff requests setting the header or query parameter to 1/true/yes/on are
+# profiled with probability PROFILING_SAMPLE_RATE; PROFILING_INTERVAL is the
+# stack sampling period in seconds. Older profiles beyond
+# PROFILING_MAX_PROFILES are deleted as new ones are stored (see also
+# `manage.py prune_profiles`).
+
+PROFILING_ENABLED = True
+PROFILING_HEADER = 'X-Calendry-Profile'
+PROFILING_QUERY_PARAM = 'profile'
+PROFILING_SAMPLE_RATE = 1.0
+PROFILING_INTERVAL = 0.001
+PROFILING_MAX_PROFILES = 500
+
+# Admin changelists stop counting rows past this many (core.admin.EstimatedCountPaginator).
+ADMIN_COUNT_LIMIT = 10000
+
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login'
@@ -20,11 +20,14 @@ from django.contrib import admin
 from django.urls import path
 from core.views import (
     home, register_view, login_view, logout_view,
-    dashboard, calendar_view, get_events,
-    create_event, EventListView, EventCreateView, 
+    dashboard, calendar_view, get_events, stream_events,
+    create_event, update_event, delete_event, EventListView, EventCreateView, 
     EventUpdateView, EventDeleteView,
     task_list, task_create, task_update, 
-    task_delete, task_toggle, settings
+    task_delete, task_toggle, settings,
+    profile_picture_variant, time_usage_report, task_throughput_report,
+    profile_list, profile_detail, profile_flamegraph,
+    task_board, task_board_data, task_move
 )
 
 urlpatterns = [
@@ -40,11 +43,23 @@ urlpatterns = [
     path('events/<int:pk>/update/', EventUpdateView.as_view(), name='event_update'),
     path('events/<int:pk>/delete/', EventDeleteView.as_view(), name='event_delete'),
     path('api/events/', get_events, name='get_events'),
+    path('api/events/stream/', stream_events, name='stream_events'),
     path('api/events/create/', create_event, name='create_event'),
+    path('api/events/<int:event_id>/update/', update_event, name='update_event'),
+    path('api/events/<int:event_id>/delete/', delete_event, name='delete_event'),
+    path('api/analytics/time-usage/', time_usage_report, name='time_usage_report'),
+    path('api/analytics/tasks/', task_throughput_report, name='task_throughput_report'),
     path('tasks/', task_list, name='task_list'),
     path('tasks/create/', task_create, name='task_create'),
+    path('tasks/board/', task_board, name='task_board'),
+    path('api/tasks/board/', task_board_data, name='task_board_data'),
+    path('api/tasks/<int:task_id>/move/', task_move, name='task_move'),
     path('tasks/<int:task_id>/update/', task_update, name='task_update'),
     path('tasks/<int:task_id>/delete/', task_delete, name='task_delete'),
     path('tasks/<int:task_id>/toggle/', task_toggle, name='task_toggle'),
     path('settings/', settings, name='settings'),
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/<int:profile_id>/', profile_detail, name='profile_detail'),
+    path('profiles/<int:profile_id>/flamegraph/', profile_flamegraph, name='profile_flamegraph'),
+    path('media/profile_pics/variants/<str:name>', profile_picture_variant, name='profile_picture_variant'),
 ]
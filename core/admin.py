@@ -1,8 +1,16 @@
 # core/admin.py
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Event
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import User, Event, Task
+from .sharding import shard_aliases, shard_for_user
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'timezone', 'is_staff')
@@ -10,10 +18,126 @@ class CustomUserAdmin(UserAdmin):
         (None, {'fields': ('profile_picture', 'timezone')}),
     )
 
-class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'user', 'start_time', 'end_time', 'event_type')
-    list_filter = ('event_type', 'user')
-    search_fields = ('title', 'description')
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*).
+
+    On PostgreSQL an unfiltered changelist uses the planner's row estimate;
+    otherwise rows are only counted up to ADMIN_COUNT_LIMIT, which is enough
+    to draw the page links without scanning the whole table. Pages past the
+    limit are not reachable, so the admins list the newest rows first.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > limit:
+                return row[0]
+        return queryset.order_by().values('pk')[:limit].count()
+
+class SelectedUserFilter(admin.SimpleListFilter):
+    """
+    Filter by owner without rendering every user in the sidebar: only the
+    currently selected user is listed. Pick a user from the "user" column
+    links or with ?user=<id>.
+    """
+    title = 'user'
+    parameter_name = 'user'
+
+    def lookups(self, request, model_admin):
+        user_id = self.value()
+        if not user_id or not user_id.isdigit():
+            return []
+        return User.objects.filter(pk=user_id).values_list('pk', 'username')
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(user_id=self.value())
+        return queryset
+
+class ScalableOwnedModelAdmin(admin.ModelAdmin):
+    """Shared changelist settings for the large per-user Event and Task tables."""
+    autocomplete_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # See get_search_results(): exact id or case-sensitive title prefix.
+    search_fields = ('title',)
+
+    def shard_for_request(self, request):
+        # Rows live on their owner's shard; without a user filter only
+        # the "default" shard is listed.
+        user_id = request.GET.get(SelectedUserFilter.parameter_name, '')
+        return shard_for_user(int(user_id)) if user_id.isdigit() else 'default'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(self.shard_for_request(request))
+
+    def get_search_results(self, request, queryset, search_term):
+        # __startswith becomes a case-insensitive LIKE on SQLite, which the
+        # title index can't serve; a range on the raw value can.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        matches = Q(title__gte=term, title__lt=term + '\U0010ffff')
+        if term.isdigit():
+            matches |= Q(pk=int(term))
+        return queryset.filter(matches), False
+
+    def get_changelist_instance(self, request):
+        # Usernames are loaded from "default" in one query rather than joined,
+        # since core_user does not exist on the other shards.
+        changelist = super().get_changelist_instance(request)
+        usernames = dict(
+            User.objects.using('default')
+            .filter(pk__in={obj.user_id for obj in changelist.result_list})
+            .values_list('pk', 'username')
+        )
+        for obj in changelist.result_list:
+            obj._owner_username = usernames.get(obj.user_id, obj.user_id)
+        return changelist
+
+    def get_object(self, request, object_id, from_field=None):
+        # Change/delete links carry no ?user=, so look the row up on every shard.
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            return obj
+        queryset = self.get_queryset(request)
+        field = self.model._meta.pk if from_field is None else self.model._meta.get_field(from_field)
+        for alias in shard_aliases():
+            if alias == queryset.db:
+                continue
+            try:
+                return queryset.using(alias).get(**{field.name: field.to_python(object_id)})
+            except (self.model.DoesNotExist, ValidationError, ValueError):
+                continue
+        return None
+
+    @admin.display(description='user', ordering='user_id')
+    def owner(self, obj):
+        return format_html('<a href="?user={}">{}</a>', obj.user_id, obj._owner_username)
+
+class EventAdmin(ScalableOwnedModelAdmin):
+    list_display = ('title', 'owner', 'start_time', 'end_time', 'event_type')
+    list_filter = ('event_type', SelectedUserFilter)
+    date_hierarchy = 'start_time'
+    # Newest first: the paginator stops counting at ADMIN_COUNT_LIMIT rows.
+    ordering = ('-start_time',)
+
+class TaskAdmin(ScalableOwnedModelAdmin):
+    list_display = ('title', 'owner', 'due_date', 'priority', 'status')
+    list_filter = ('status', 'priority', SelectedUserFilter)
+    date_hierarchy = 'due_date'
+    ordering = ('-due_date',)
 
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(Event, EventAdmin)
\ No newline at end of file
+admin.site.register(Event, EventAdmin)
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,114 @@
+# core/analytics.py
+
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, EventRollup, Task, TaskRollup
+from .sharding import shard_for_user
+
+
+def _local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return None
+
+
+def affected_dates(instance, *fields):
+    """Dates touched by an instance, before and after the current write."""
+    loaded = getattr(instance, '_loaded_values', {})
+    dates = set()
+    for field in fields:
+        for value in (loaded.get(field), getattr(instance, field, None)):
+            date = _local_date(value)
+            if date is not None:
+                dates.add(date)
+    return dates
+
+
+def rollup_fields_changed(instance, fields):
+    """
+    Whether a write changed any field a rollup depends on. Instances without
+    a snapshot from the database (new rows) always count as changed.
+    """
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return True
+    return any(field not in loaded or loaded[field] != getattr(instance, field) for field in fields)
+
+
+def remember_rollup_fields(instance, fields):
+    # Later saves of the same instance are compared with what was just rolled up.
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None:
+        loaded.update((field, getattr(instance, field)) for field in fields)
+
+
+def refresh_event_rollups(user_id, dates):
+    """Recompute EventRollup rows for the given days from the user's events."""
+    if not dates:
+        return
+    totals = defaultdict(lambda: [0, 0])
+    events = Event.objects.for_user(user_id).filter(
+        start_time__date__in=dates
+    ).values_list('start_time', 'end_time', 'event_type')
+    for start_time, end_time, event_type in events:
+        total = totals[(timezone.localdate(start_time), event_type)]
+        total[0] += 1
+        total[1] += max(int((end_time - start_time).total_seconds() // 60), 0)
+
+    db = shard_for_user(user_id)
+    with transaction.atomic(using=db):
+        EventRollup.objects.for_user(user_id).filter(date__in=dates).delete()
+        EventRollup.objects.using(db).bulk_create([
+            EventRollup(user_id=user_id, date=date, event_type=event_type,
+                        event_count=count, duration_minutes=minutes)
+            for (date, event_type), (count, minutes) in totals.items()
+        ])
+
+
+def refresh_task_rollups(user_id, dates):
+    """Recompute TaskRollup rows for the given days from the user's tasks."""
+    if not dates:
+        return
+    totals = defaultdict(lambda: [0, 0])
+    completed = Task.objects.for_user(user_id).filter(
+        completed_at__date__in=dates
+    ).values_list('completed_at', 'priority')
+    for completed_at, priority in completed:
+        totals[(timezone.localdate(completed_at), priority)][0] += 1
+    open_due = Task.objects.for_user(user_id).filter(
+        due_date__date__in=dates, completed_at__isnull=True
+    ).values_list('due_date', 'priority')
+    for due_date, priority in open_due:
+        totals[(timezone.localdate(due_date), priority)][1] += 1
+
+    db = shard_for_user(user_id)
+    with transaction.atomic(using=db):
+        TaskRollup.objects.for_user(user_id).filter(date__in=dates).delete()
+        TaskRollup.objects.using(db).bulk_create([
+            TaskRollup(user_id=user_id, date=date, priority=priority,
+                       completed_count=done, open_due_count=open_count)
+            for (date, priority), (done, open_count) in totals.items()
+        ])
+
+
+def rebuild_rollups(user_id):
+    """Drop and recompute every rollup row for one user."""
+    event_dates = {
+        timezone.localdate(start_time)
+        for start_time in Event.objects.for_user(user_id).values_list('start_time', flat=True)
+    }
+    task_dates = set()
+    for due_date, completed_at in Task.objects.for_user(user_id).values_list('due_date', 'completed_at'):
+        task_dates.add(timezone.localdate(due_date))
+        if completed_at:
+            task_dates.add(timezone.localdate(completed_at))
+
+    with transaction.atomic(using=shard_for_user(user_id)):
+        EventRollup.objects.for_user(user_id).delete()
+        TaskRollup.objects.for_user(user_id).delete()
+        refresh_event_rollups(user_id, event_dates)
+        refresh_task_rollups(user_id, task_dates)
@@ -0,0 +1,55 @@
+# core/concurrency.py
+
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+# Bookkeeping columns that never count as a user edit.
+UNTRACKED_FIELDS = {'version', 'updated_at', 'created_at'}
+
+
+def changed_fields(instance):
+    """Names of the concrete fields modified since the instance was loaded."""
+    loaded = getattr(instance, '_loaded_values', {})
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in UNTRACKED_FIELDS
+        and field.attname in loaded
+        and getattr(instance, field.attname) != loaded[field.attname]
+    ]
+
+
+def update_if_version(instance, expected_version, fields=None):
+    """
+    Optimistic write: a single UPDATE ... WHERE id = %s AND version = %s that
+    sets only `fields` (default: the fields changed since load) and bumps the
+    version. Returns False, writing nothing, if someone else saved first.
+
+    post_save is sent on success so signal receivers (rollups, caches) behave
+    as they do for save().
+    """
+    model = type(instance)
+    fields = changed_fields(instance) if fields is None else list(fields)
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        values[field.attname] = getattr(instance, field.attname)
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        values['updated_at'] = timezone.now()
+
+    db = instance._state.db
+    updated = model._base_manager.using(db).filter(
+        pk=instance.pk, version=expected_version
+    ).update(version=F('version') + 1, **values)
+    if not updated:
+        return False
+
+    instance.version = expected_version + 1
+    if 'updated_at' in values:
+        instance.updated_at = values['updated_at']
+    post_save.send(
+        sender=model, instance=instance, created=False,
+        update_fields=frozenset(values) | {'version'}, raw=False, using=db,
+    )
+    return True
@@ -45,8 +45,12 @@ class LoginForm(AuthenticationForm):
         })
 
 class EventForm(forms.ModelForm):
+    # The version the user started editing from, for optimistic concurrency.
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
         for field in self.fields:
             base_classes = 'w-full px-4 py-2 border rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500'
             if field in ['start_time', 'end_time']:
@@ -88,8 +92,12 @@ class EventForm(forms.ModelForm):
         }
 
 class TaskForm(forms.ModelForm):
+    # The version the user started editing from, for optimistic concurrency.
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
         for field in self.fields:
             self.fields[field].widget.attrs.update({
                 'class': 'w-full px-4 py-2 border rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500'
@@ -111,3 +119,8 @@ class TaskForm(forms.ModelForm):
         model = Task
         fields = ['title', 'description', 'due_date', 'priority', 'status']
 
+
+class ProfilePictureForm(forms.ModelForm):
+    class Meta:
+        model = User
+        fields = ['profile_picture']
@@ -0,0 +1,18 @@
+# core/hashers.py
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class CalendryPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose work factor comes from PASSWORD_HASH_ITERATIONS.
+
+    Bumping the setting makes must_update() report older hashes as stale,
+    so they are upgraded on the user's next successful login. The algorithm
+    name is unchanged, so existing "pbkdf2_sha256$..." hashes keep verifying.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,102 @@
+# core/holidays.py
+
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Holiday, HolidayCalendar
+
+DATASET_PATH = Path(__file__).resolve().parent / 'data' / 'holidays.json'
+
+# Holidays rarely change once loaded, so each process keeps them in memory:
+# region -> (sorted dates, names). load_holidays can only clear the cache of
+# its own process, so every process also drops its copy after
+# HOLIDAY_CACHE_TIMEOUT seconds and picks up newly loaded regions then.
+_holidays = {}
+_calendars = None
+_loaded_at = time.monotonic()
+_lock = threading.Lock()
+
+
+def load_dataset():
+    with open(DATASET_PATH) as f:
+        return json.load(f)['regions']
+
+
+@transaction.atomic
+def load_region(region, data):
+    """Store one region's holidays from the bundled dataset; returns rows added."""
+    calendar, _ = HolidayCalendar.objects.update_or_create(
+        region=region, defaults={'name': data['name']}
+    )
+    before = calendar.holidays.count()
+    Holiday.objects.bulk_create(
+        [Holiday(calendar=calendar, date=date, name=name) for date, name in data['holidays']],
+        ignore_conflicts=True,
+    )
+    clear_cache()
+    return calendar.holidays.count() - before
+
+
+def clear_cache():
+    global _calendars, _loaded_at
+    with _lock:
+        _holidays.clear()
+        _calendars = None
+        _loaded_at = time.monotonic()
+
+
+def _expire_cache():
+    if time.monotonic() - _loaded_at > getattr(settings, 'HOLIDAY_CACHE_TIMEOUT', 60 * 10):
+        clear_cache()
+
+
+def available_calendars():
+    """(region, name) pairs of every loaded calendar."""
+    global _calendars
+    _expire_cache()
+    # Read into a local: another thread may expire the cache meanwhile.
+    calendars = _calendars
+    if calendars is None:
+        calendars = list(HolidayCalendar.objects.order_by('name').values_list('region', 'name'))
+        if not calendars:
+            return []
+        with _lock:
+            _calendars = calendars
+    return calendars
+
+
+def region_holidays(region):
+    _expire_cache()
+    holidays = _holidays.get(region)
+    if holidays is None:
+        rows = list(
+            Holiday.objects.filter(calendar__region=region)
+            .order_by('date', 'name').values_list('date', 'name')
+        )
+        if not rows:
+            # Not loaded (yet); don't pin an empty result for the process lifetime.
+            return [], []
+        holidays = ([date for date, _ in rows], [name for _, name in rows])
+        with _lock:
+            _holidays[region] = holidays
+    return holidays
+
+
+def holidays_between(regions, start, end):
+    """
+    (region, date, name) tuples for the given regions with start <= date <= end,
+    ordered by date, served from the in-process cache.
+    """
+    found = []
+    for region in regions:
+        dates, names = region_holidays(region)
+        for i in range(bisect_left(dates, start), bisect_right(dates, end)):
+            found.append((region, dates[i], names[i]))
+    found.sort(key=lambda holiday: holiday[1])
+    return found
@@ -0,0 +1,93 @@
+# core/images.py
+
+import hashlib
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .middleware import invalidate_cached_user
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# field name -> square size in pixels
+PROFILE_PICTURE_VARIANTS = {
+    'profile_avatar': 256,
+    'profile_thumbnail': 64,
+}
+VARIANT_DIR = 'profile_pics/variants/'
+# "<user id>-<size>-<content hash>.jpg", as written by build_profile_picture_variants().
+VARIANT_NAME_RE = re.compile(r'\d+-\d+-[0-9a-f]{16}\.jpg')
+JPEG_QUALITY = 82
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PROFILE_PICTURE_WORKERS', 2),
+    thread_name_prefix='profile-pictures',
+)
+
+
+def schedule_profile_picture_variants(user):
+    """Queue variant generation for once the current transaction commits."""
+    user_id = user.pk
+    transaction.on_commit(lambda: _executor.submit(build_profile_picture_variants, user_id))
+
+
+def render_variant(image, size):
+    variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def build_profile_picture_variants(user_id):
+    """
+    Decode the user's profile picture once and store every variant under a
+    content-hashed name, so the files can be cached forever by clients.
+    Variants of the previous picture are deleted once the new ones are in
+    place; a removed picture clears them.
+    """
+    close_old_connections()
+    try:
+        user = User.objects.filter(pk=user_id).only('profile_picture', *PROFILE_PICTURE_VARIANTS).first()
+        if user is None:
+            return
+        storage = user.profile_picture.storage
+        old_names = {getattr(user, field).name for field in PROFILE_PICTURE_VARIANTS} - {'', None}
+
+        names = dict.fromkeys(PROFILE_PICTURE_VARIANTS, '')
+        if user.profile_picture:
+            with user.profile_picture.open('rb') as source:
+                image = Image.open(source)
+                image = ImageOps.exif_transpose(image).convert('RGB')
+
+            for field, size in PROFILE_PICTURE_VARIANTS.items():
+                data = render_variant(image, size)
+                digest = hashlib.sha256(data).hexdigest()[:16]
+                name = f'{VARIANT_DIR}{user_id}-{size}-{digest}.jpg'
+                if not storage.exists(name):
+                    storage.save(name, ContentFile(data))
+                names[field] = name
+
+        if user.profile_picture:
+            unchanged = Q(profile_picture=user.profile_picture.name)
+        else:
+            unchanged = Q(profile_picture='') | Q(profile_picture__isnull=True)
+        updated = User.objects.filter(unchanged, pk=user_id).update(**names)
+        if not updated:
+            # The picture changed again meanwhile; its own build cleans up.
+            return
+        # update() does not send post_save, so drop the cached request.user here.
+        invalidate_cached_user(user_id)
+        for name in old_names - set(names.values()):
+            storage.delete(name)
+    except Exception:
+        logger.exception("Could not build profile picture variants for user %s", user_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.holidays import load_dataset, load_region
+
+
+class Command(BaseCommand):
+    help = "Load shared holiday calendars from the bundled dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument('regions', nargs='*', metavar='REGION',
+                            help="Region codes to load (default: every region in the dataset).")
+
+    def handle(self, *args, regions=None, **options):
+        dataset = load_dataset()
+        regions = [region.upper() for region in regions] or sorted(dataset)
+        unknown = [region for region in regions if region not in dataset]
+        if unknown:
+            raise CommandError(f"Unknown region(s): {', '.join(unknown)}. Available: {', '.join(sorted(dataset))}.")
+        for region in regions:
+            added = load_region(region, dataset[region])
+            self.stdout.write(f"{region}: {added} holiday(s) added")
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(regions)} calendar(s)."))
@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.models import ShardAssignment, User
+from core.sharding import seed_shard_sequences, shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Run migrations on every user shard and seed each shard's id range."
+
+    def handle(self, *args, **options):
+        for alias in shard_aliases():
+            self.stdout.write(f"Migrating {alias}...")
+            call_command('migrate', database=alias, verbosity=options['verbosity'], interactive=False)
+            seed_shard_sequences(alias)
+
+        # Users without a shard map entry have only ever written to "default";
+        # pin them there before new shards change where they would hash to.
+        unassigned = User.objects.filter(shardassignment__isnull=True).values_list('pk', flat=True)
+        ShardAssignment.objects.bulk_create(
+            [ShardAssignment(user_id=user_id, shard='default') for user_id in unassigned.iterator()],
+            batch_size=500,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Migrated {len(shard_aliases())} shard(s)."))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.profiling import prune_profiles
+
+
+class Command(BaseCommand):
+    help = "Delete old request profiles, keeping the newest PROFILING_MAX_PROFILES."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=getattr(settings, 'PROFILING_MAX_PROFILES', 500),
+                            help="Number of newest profiles to keep.")
+        parser.add_argument('--days', type=int,
+                            help="Also delete profiles older than this many days.")
+
+    def handle(self, *args, keep, days=None, **options):
+        older_than = timezone.now() - timedelta(days=days) if days is not None else None
+        deleted = prune_profiles(keep, older_than)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} profile(s)."))
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ShardAssignment, User
+from core.sharding import move_user, shard_aliases, shard_for_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users between shards. With --user and --to, move one user; "
+        "otherwise even out the number of users per shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help="Username to move.")
+        parser.add_argument('--to', dest='target', help="Destination shard alias.")
+        parser.add_argument('--dry-run', action='store_true', help="Only print the planned moves.")
+
+    def handle(self, *args, username=None, target=None, dry_run=False, **options):
+        aliases = shard_aliases()
+        if target is not None and target not in aliases:
+            raise CommandError(f"Unknown shard {target!r}; expected one of {', '.join(aliases)}.")
+
+        if username:
+            if target is None:
+                raise CommandError("--user needs --to.")
+            try:
+                user_id = User.objects.values_list('pk', flat=True).get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+            moves = [(user_id, target)]
+        else:
+            moves = self.plan_rebalance(aliases)
+
+        for user_id, destination in moves:
+            if dry_run:
+                self.stdout.write(f"Would move user {user_id} -> {destination}")
+                continue
+            rows = move_user(user_id, destination)
+            self.stdout.write(f"Moved user {user_id} -> {destination} ({rows} rows)")
+        self.stdout.write(self.style.SUCCESS(f"{len(moves)} move(s)."))
+
+    def plan_rebalance(self, aliases):
+        # Pin every user first so the plan starts from the real placement.
+        for user_id in User.objects.values_list('pk', flat=True).iterator():
+            shard_for_user(user_id)
+
+        per_shard = {alias: [] for alias in aliases}
+        for user_id, shard in ShardAssignment.objects.order_by('pk').values_list('user_id', 'shard'):
+            per_shard.setdefault(shard, []).append(user_id)
+        load = Counter({alias: len(users) for alias, users in per_shard.items()})
+
+        moves = []
+        # Users on shards that are no longer configured must move regardless.
+        for alias in list(per_shard):
+            if alias not in aliases:
+                for user_id in per_shard.pop(alias):
+                    destination = min(aliases, key=lambda a: load[a])
+                    moves.append((user_id, destination))
+                    per_shard[destination].insert(0, user_id)
+                    load[destination] += 1
+                del load[alias]
+
+        while True:
+            fullest = max(aliases, key=lambda a: load[a])
+            emptiest = min(aliases, key=lambda a: load[a])
+            if load[fullest] - load[emptiest] <= 1:
+                return moves
+            moves.append((per_shard[fullest].pop(), emptiest))
+            load[fullest] -= 1
+            load[emptiest] += 1
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.analytics import rebuild_rollups
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily event and task rollup tables from raw rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only rebuild this user's rollups (repeatable).")
+
+    def handle(self, *args, usernames=None, **options):
+        users = User.objects.order_by('pk')
+        if usernames:
+            users = users.filter(username__in=usernames)
+        count = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_rollups(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {count} user(s)."))
@@ -0,0 +1,228 @@
+# core/middleware.py
+
+import json
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import cache
+from django.db import connections
+from django.http import FileResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import RequestProfile
+from .profiling import QueryRecorder, StackSampler, is_requested, prune_profiles
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 15)
+
+
+def user_cache_key(user_id):
+    return f'core:auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def get_cached_user(request):
+    """
+    Return the session's user from the cache when the cached entry was stored
+    for the same session auth hash, otherwise fall back to auth.get_user().
+
+    The auth hash is derived from the password, so a password change stops old
+    sessions from matching even before the entry is invalidated; any other
+    change to the user is handled by the post_save/post_delete receivers.
+    """
+    session = request.session
+    user_id = session.get(SESSION_KEY)
+    session_hash = session.get(HASH_SESSION_KEY)
+    backend_path = session.get(BACKEND_SESSION_KEY)
+
+    if user_id and session_hash and backend_path in settings.AUTHENTICATION_BACKENDS:
+        cached = cache.get(user_cache_key(user_id))
+        if cached is not None and constant_time_compare(cached['hash'], session_hash):
+            user = cached['user']
+            user.backend = backend_path
+            return user
+
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            user_cache_key(user.pk),
+            {'hash': user.get_session_auth_hash(), 'user': user},
+            USER_CACHE_TIMEOUT,
+        )
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_cached_user(request)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(get_cached_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Drop-in replacement for AuthenticationMiddleware that serves request.user
+    from the cache, so steady-state requests skip the user-table query.
+    Settings only install it when the cache is shared between workers
+    (settings.SHARED_CACHE), so invalidation reaches every process.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = lambda: auser(request)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in, staff-only request profiling.
+
+    A request from a staff user that sets the PROFILING_HEADER header or the
+    PROFILING_QUERY_PARAM parameter to a true value ("1", "true", "yes",
+    "on") is profiled with probability PROFILING_SAMPLE_RATE. The stack
+    samples, SQL statements with timings and the template render estimate are
+    stored as a RequestProfile, whose id is returned in the X-Profile-Id
+    response header. Only the newest PROFILING_MAX_PROFILES are kept.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            return False
+        requested = (
+            is_requested(request.headers.get(settings.PROFILING_HEADER))
+            or is_requested(request.GET.get(settings.PROFILING_QUERY_PARAM))
+        )
+        if not requested or not request.user.is_staff:
+            return False
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            sampler = stack.enter_context(StackSampler(settings.PROFILING_INTERVAL))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        profile = RequestProfile.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            status_code=response.status_code,
+            duration_ms=duration_ms,
+            template_ms=sampler.template_ms(),
+            sql_queries=recorder.queries,
+            collapsed_stacks=sampler.collapsed(),
+        )
+        prune_profiles(getattr(settings, 'PROFILING_MAX_PROFILES', 500))
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+def accepted_encodings(header):
+    """Map each content-coding in an Accept-Encoding header to its q-value."""
+    codings = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding.lower()] = quality
+    return codings
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files in-process from STATIC_ROOT.
+
+    Hashed names from the staticfiles manifest get a one-year immutable
+    Cache-Control; precompressed ".br"/".gz" siblings are picked by
+    Accept-Encoding, with "Vary: Accept-Encoding" on every response. The file
+    index is built once at startup, so unknown paths fall through to the
+    normal handlers without touching the filesystem.
+    """
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT) if getattr(settings, 'STATIC_ROOT', None) else None
+        self.files = self.scan() if self.root else {}
+        self.immutable = self.load_hashed_names()
+
+    def scan(self):
+        files = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[name] = path
+        return files
+
+    def load_hashed_names(self):
+        manifest = self.files.get('staticfiles.json')
+        if manifest is None:
+            return set()
+        with open(manifest) as f:
+            return set(json.load(f).get('paths', {}).values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            name = request.path[len(self.prefix):]
+            if name in self.files and not name.endswith(('.gz', '.br')):
+                return self.serve(request, name)
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        path = self.files[name]
+        encoding = None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        best = 0
+        # Highest q-value wins; ties go to the first (smallest) encoding.
+        for candidate, suffix in self.ENCODINGS:
+            quality = accepted.get(candidate, accepted.get('*', 0))
+            if quality > best and name + suffix in self.files:
+                path, encoding, best = self.files[name + suffix], candidate, quality
+
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        if name in self.immutable:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=60'
+        return response
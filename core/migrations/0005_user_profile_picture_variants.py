@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_event_options_event_is_recurring_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_avatar',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pics/variants/'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pics/variants/'),
+        ),
+    ]
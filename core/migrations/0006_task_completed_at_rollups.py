@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:04
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+def backfill_completed_at(apps, schema_editor):
+    # The real completion time was never stored; updated_at is the closest guess.
+    Task = apps.get_model('core', 'Task')
+    Task.objects.filter(Q(completed=True) | Q(status='done')).update(completed_at=F('updated_at'))
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same totals as core.analytics.rebuild_rollups(), so the reports cover
+    # existing history without a separate rebuild_rollups run.
+    db = schema_editor.connection.alias
+    Event = apps.get_model('core', 'Event')
+    Task = apps.get_model('core', 'Task')
+    EventRollup = apps.get_model('core', 'EventRollup')
+    TaskRollup = apps.get_model('core', 'TaskRollup')
+
+    event_totals = defaultdict(lambda: [0, 0])
+    events = Event.objects.using(db).values_list('user_id', 'start_time', 'end_time', 'event_type')
+    for user_id, start_time, end_time, event_type in events.iterator():
+        total = event_totals[(user_id, timezone.localdate(start_time), event_type)]
+        total[0] += 1
+        total[1] += max(int((end_time - start_time).total_seconds() // 60), 0)
+    EventRollup.objects.using(db).bulk_create([
+        EventRollup(user_id=user_id, date=date, event_type=event_type,
+                    event_count=count, duration_minutes=minutes)
+        for (user_id, date, event_type), (count, minutes) in event_totals.items()
+    ], batch_size=500)
+
+    task_totals = defaultdict(lambda: [0, 0])
+    tasks = Task.objects.using(db).values_list('user_id', 'due_date', 'completed_at', 'priority')
+    for user_id, due_date, completed_at, priority in tasks.iterator():
+        if completed_at is not None:
+            task_totals[(user_id, timezone.localdate(completed_at), priority)][0] += 1
+        else:
+            task_totals[(user_id, timezone.localdate(due_date), priority)][1] += 1
+    TaskRollup.objects.using(db).bulk_create([
+        TaskRollup(user_id=user_id, date=date, priority=priority,
+                   completed_count=done, open_due_count=open_count)
+        for (user_id, date, priority), (done, open_count) in task_totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('event_type', models.CharField(choices=[('meeting', 'Meeting'), ('reminder', 'Reminder'), ('task', 'Task'), ('holiday', 'Holiday'), ('other', 'Other')], max_length=20)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('duration_minutes', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'event_type'), name='unique_event_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('open_due_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'priority'), name='unique_task_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
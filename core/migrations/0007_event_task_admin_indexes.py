@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_task_completed_at_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start_time'], name='core_event_user_id_ddf4a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_time'], name='core_event_start_t_61b12a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'due_date'], name='core_task_user_id_d96f3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date'], name='core_task_due_dat_d0a0d3_idx'),
+        ),
+    ]
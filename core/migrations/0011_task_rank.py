@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:14
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+from core.ranks import spread_ranks
+
+
+def assign_ranks(apps, schema_editor):
+    # Seed each board column in its current due-date order.
+    Task = apps.get_model('core', 'Task')
+    tasks = list(
+        Task.objects.using(schema_editor.connection.alias)
+        .order_by('user_id', 'status', 'due_date', 'id').only('id', 'user_id', 'status')
+    )
+    for _, column in groupby(tasks, key=lambda task: (task.user_id, task.status)):
+        column = list(column)
+        for task, rank in zip(column, spread_ranks(len(column))):
+            task.rank = rank
+    Task.objects.using(schema_editor.connection.alias).bulk_update(tasks, ['rank'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_holiday_calendars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'rank'], name='core_task_user_id_ed6aef_idx'),
+        ),
+        migrations.RunPython(assign_ranks, migrations.RunPython.noop, hints={'model_name': 'task'}),
+    ]
@@ -4,7 +4,12 @@ from django.utils import timezone
 
 class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    # Resized copies of profile_picture, generated by core.images off the request thread.
+    profile_avatar = models.ImageField(upload_to='profile_pics/variants/', null=True, blank=True, editable=False)
+    profile_thumbnail = models.ImageField(upload_to='profile_pics/variants/', null=True, blank=True, editable=False)
     timezone = models.CharField(max_length=100, default='UTC')
+    # Region codes of the shared HolidayCalendars this user subscribes to.
+    holiday_calendars = models.JSONField(default=list, blank=True)
     
     # Add these to resolve the reverse accessor clashes
     groups = models.ManyToManyField(
@@ -23,6 +28,43 @@ class User(AbstractUser):
         related_name="core_user_permissions",
         related_query_name="user",
     )
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so a changed profile picture can be detected on save.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+def bump_version(instance, save_kwargs):
+    # Plain save() calls are last-writer-wins for the fields they write. The
+    # version is incremented in the database rather than from the (possibly
+    # stale) loaded value, so every save invalidates the version other
+    # clients read and their conditional updates fail. Returns True when the
+    # caller must reload the new version after saving.
+    if instance._state.adding:
+        return False
+    instance.version = models.F('version') + 1
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = {*save_kwargs['update_fields'], 'version'}
+    return True
+
+
+class UserScopedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Rows owned by `user` (a User or user id), read from that user's shard."""
+        from .sharding import shard_for_user
+        return self.using(shard_for_user(user)).filter(user_id=getattr(user, 'pk', user))
+
+    def create(self, **kwargs):
+        # Manager.create() would write to the router's hint-less default; save()
+        # routes on the instance, i.e. to the owner's shard.
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
 
 class Event(models.Model):
     EVENT_TYPES = (
@@ -42,8 +84,10 @@ class Event(models.Model):
         ('#ec4899', 'Pink')
     )
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    title = models.CharField(max_length=200)
+    # No DB-level constraint: with sharding the user row lives in another database.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    objects = UserScopedQuerySet.as_manager()
+    title = models.CharField(max_length=200, db_index=True)
     description = models.TextField(blank=True)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
@@ -55,10 +99,25 @@ class Event(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_recurring = models.BooleanField(default=False)
     recurrence_pattern = models.CharField(max_length=100, blank=True)
+    # Bumped on every write; see core.concurrency.update_if_version().
+    version = models.PositiveIntegerField(default=1, editable=False)
     
     def __str__(self):
         return f"{self.title} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so rollups can refresh the day an event moved away from.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        bumped = bump_version(self, kwargs)
+        super().save(*args, **kwargs)
+        if bumped:
+            self.refresh_from_db(fields=['version'])
+    
     @property
     def get_html_url(self):
         return f'<a href="/events/{self.id}/update/">{self.title}</a>'
@@ -78,6 +137,10 @@ class Event(models.Model):
         ordering = ['start_time']
         verbose_name = 'Event'
         verbose_name_plural = 'Events'
+        indexes = [
+            models.Index(fields=['user', 'start_time']),
+            models.Index(fields=['start_time']),
+        ]
 
 class Task(models.Model):
     PRIORITY_CHOICES = [
@@ -91,18 +154,156 @@ class Task(models.Model):
         ('done', 'Done'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    title = models.CharField(max_length=200)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    objects = UserScopedQuerySet.as_manager()
+    title = models.CharField(max_length=200, db_index=True)
     description = models.TextField(blank=True)
     due_date = models.DateTimeField()
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='todo')
+    # Position within the status column on the board; see core.ranks.
+    rank = models.CharField(max_length=64, blank=True, default='', editable=False)
     completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so rollups can refresh the day a task moved away from.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    @property
+    def is_done(self):
+        return self.completed or self.status == 'done'
+    
+    def save(self, *args, **kwargs):
+        if not self.rank:
+            self.sync_rank()
+        self.sync_completed_at()
+        bumped = bump_version(self, kwargs)
+        super().save(*args, **kwargs)
+        if bumped:
+            self.refresh_from_db(fields=['version'])
+    
+    def sync_rank(self):
+        # A task without a rank, or one whose status changed without being
+        # given a position in the new column, goes to the end of its column.
+        loaded = getattr(self, '_loaded_values', {})
+        if self.rank and loaded.get('status', self.status) == self.status:
+            return
+        from .ranks import rank_between
+        last = (
+            Task.objects.for_user(self.user_id).filter(status=self.status)
+            .exclude(pk=self.pk).order_by('-rank').values_list('rank', flat=True).first()
+        )
+        self.rank = rank_between(last or '', None)
+    
+    def sync_completed_at(self):
+        if self.is_done and self.completed_at is None:
+            self.completed_at = timezone.now()
+        elif not self.is_done:
+            self.completed_at = None
+    
     class Meta:
         ordering = ['due_date']
+        indexes = [
+            models.Index(fields=['user', 'status', 'rank']),
+            models.Index(fields=['user', 'due_date']),
+            models.Index(fields=['due_date']),
+        ]
+
+
+class EventRollup(models.Model):
+    """Per-user, per-day totals of scheduled time by event type."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    objects = UserScopedQuerySet.as_manager()
+    date = models.DateField()
+    event_type = models.CharField(max_length=20, choices=Event.EVENT_TYPES)
+    event_count = models.PositiveIntegerField(default=0)
+    duration_minutes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'event_type'], name='unique_event_rollup'),
+        ]
+
+
+class TaskRollup(models.Model):
+    """
+    Per-user, per-day task counts by priority: tasks completed on the day and
+    tasks due on the day that are still open.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    objects = UserScopedQuerySet.as_manager()
+    date = models.DateField()
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES)
+    completed_count = models.PositiveIntegerField(default=0)
+    open_due_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'priority'], name='unique_task_rollup'),
+        ]
+
+
+class HolidayCalendar(models.Model):
+    """A shared, read-only set of public holidays for one region."""
+    region = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=100)
+    
+    def __str__(self):
+        return self.name
+
+
+class Holiday(models.Model):
+    calendar = models.ForeignKey(HolidayCalendar, on_delete=models.CASCADE, related_name='holidays')
+    date = models.DateField()
+    name = models.CharField(max_length=200)
+    
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'date', 'name'], name='unique_holiday'),
+        ]
+
+
+class ShardAssignment(models.Model):
+    """Shard map: which database alias holds a user's events and tasks."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    shard = models.CharField(max_length=50, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.shard}"
+
+
+class RequestProfile(models.Model):
+    """A single profiled request, captured by core.middleware.ProfilingMiddleware."""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    template_ms = models.FloatField(default=0)
+    sql_queries = models.JSONField(default=list)
+    collapsed_stacks = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+    
+    @property
+    def sql_ms(self):
+        return sum(query['ms'] for query in self.sql_queries)
+    
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,127 @@
+# core/profiling.py
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Q
+
+TEMPLATE_DIR = os.path.join('django', 'template', '')
+
+# Values of the profiling header/parameter that switch profiling on.
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+def is_requested(value):
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+def prune_profiles(keep, older_than=None):
+    """
+    Delete all but the newest `keep` RequestProfiles, and any created before
+    `older_than` when given. Returns the number of profiles deleted.
+    """
+    from .models import RequestProfile
+
+    profiles = RequestProfile.objects.all()
+    stale = Q(created_at__lt=older_than) if older_than is not None else Q(pk__in=[])
+    boundary = profiles.order_by('-pk').values_list('pk', flat=True)[keep:keep + 1].first()
+    if boundary is not None:
+        stale |= Q(pk__lte=boundary)
+    deleted, _ = profiles.filter(stale).delete()
+    return deleted
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sample the calling thread's Python stack every `interval` seconds from a
+    background thread. The result is a Counter of root-to-leaf stacks, which
+    is exactly the "collapsed stack" input used by flamegraph tools.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self.template_samples = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            in_template = False
+            while frame is not None:
+                stack.append(frame_label(frame))
+                in_template = in_template or TEMPLATE_DIR in frame.f_code.co_filename
+                frame = frame.f_back
+            if in_template:
+                self.template_samples += 1
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def template_ms(self):
+        """Time spent in Django's template engine, estimated from the samples."""
+        return self.template_samples * self.interval * 1000
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() hook that records SQL and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+                'db': context['connection'].alias,
+            })
+
+
+def build_call_tree(collapsed, limit=None):
+    """
+    Turn collapsed stacks back into a nested call tree of
+    {'name', 'samples', 'children'} dicts, children sorted by weight.
+    """
+    root = {'name': 'all', 'samples': 0, 'children': {}}
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(' ')
+        count = int(count)
+        node = root
+        node['samples'] += count
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'name': name, 'samples': 0, 'children': {}})
+            node['samples'] += count
+
+    def finish(node, depth):
+        children = sorted(node['children'].values(), key=lambda child: -child['samples'])
+        if limit is not None and depth >= limit:
+            children = []
+        node['children'] = [finish(child, depth + 1) for child in children]
+        return node
+
+    return finish(root, 0)
@@ -0,0 +1,108 @@
+# core/ranks.py
+#
+# Fractional ordering keys for the task board. Ranks are strings over 0-9a-z
+# that sort lexicographically, so a task can always be placed between two
+# neighbours by writing a new key on that one row. Keys never end in "0",
+# which guarantees there is always room below any key.
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# Columns whose keys grow past this length are renumbered in the background.
+REBALANCE_LENGTH = 12
+
+logger = logging.getLogger(__name__)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-ranks')
+
+
+def rank_between(before, after):
+    """
+    Return a key strictly between `before` and `after`. Pass '' for "no task
+    above" and None for "no task below".
+    """
+    if after is not None and after <= before:
+        raise ValueError(f"{before!r} must sort before {after!r}")
+    result = ''
+    i = 0
+    while True:
+        lo = DIGITS.index(before[i]) if i < len(before) else 0
+        hi = DIGITS.index(after[i]) if after is not None and i < len(after) else BASE
+        if lo == hi:
+            result += DIGITS[lo]
+            i += 1
+            continue
+        mid = (lo + hi) // 2
+        if mid > lo:
+            return result + DIGITS[mid]
+        # Adjacent digits: keep `lo` here and find room after the rest of `before`.
+        result += DIGITS[lo]
+        after = None
+        i += 1
+
+
+def spread_ranks(count):
+    """`count` short keys, evenly spaced so later inserts stay short."""
+    width = 1
+    while BASE ** width <= count * 4:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for i in range(1, count + 1):
+        value = i * step
+        digits = ''
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits = DIGITS[digit] + digits
+        ranks.append(digits.rstrip('0'))
+    return ranks
+
+
+class ColumnChanged(Exception):
+    """A task in the column moved while it was being renumbered."""
+
+
+def rebalance_column(user_id, status, attempts=3):
+    """
+    Renumber one board column with evenly spaced keys, keeping its order.
+
+    SQLite ignores select_for_update(), so each row is only rewritten if it
+    still has the rank it was read with, and the column order is checked
+    again before committing. If a task moved in the meantime the pass is
+    rolled back and retried. Returns False if every attempt was interrupted.
+    """
+    from .models import Task
+
+    tasks = Task.objects.for_user(user_id).filter(status=status)
+    for _ in range(attempts):
+        try:
+            with transaction.atomic(using=tasks.db):
+                column = list(tasks.select_for_update().order_by('rank', 'id').values_list('id', 'rank'))
+                for (pk, old), new in zip(column, spread_ranks(len(column))):
+                    if not tasks.filter(pk=pk, rank=old).update(rank=new):
+                        raise ColumnChanged
+                if list(tasks.order_by('rank', 'id').values_list('id', flat=True)) != [pk for pk, _ in column]:
+                    raise ColumnChanged
+            return True
+        except ColumnChanged:
+            continue
+    return False
+
+
+def _rebalance_in_background(user_id, status):
+    close_old_connections()
+    try:
+        if not rebalance_column(user_id, status):
+            logger.warning("Gave up rebalancing task ranks for user %s (%s); the column kept changing", user_id, status)
+    except Exception:
+        logger.exception("Could not rebalance task ranks for user %s (%s)", user_id, status)
+    finally:
+        close_old_connections()
+
+
+def schedule_rebalance(user_id, status):
+    transaction.on_commit(lambda: _executor.submit(_rebalance_in_background, user_id, status))
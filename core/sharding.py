@@ -0,0 +1,181 @@
+# core/sharding.py
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+# Models whose rows belong to exactly one user and live on that user's shard.
+SHARDED_MODELS = {'event', 'task', 'eventrollup', 'taskrollup'}
+SHARD_MAP_CACHE_TIMEOUT = 60 * 5
+
+# Each shard hands out primary keys from its own block so rows can be moved
+# between shards without colliding (see seed_shard_sequences()).
+SHARD_ID_BLOCK = 10 ** 12
+
+
+def shard_aliases():
+    return list(getattr(settings, 'USER_SHARDS', None) or ['default'])
+
+
+def is_sharded(model):
+    # Accepts a model class or an instance; instances are read through _meta
+    # so lazy wrappers such as request.user work too.
+    return model._meta.app_label == 'core' and model._meta.model_name in SHARDED_MODELS
+
+
+def sharded_models():
+    return [model for model in apps.get_app_config('core').get_models() if is_sharded(model)]
+
+
+def shard_cache_key(user_id):
+    return f'core:user-shard:{user_id}'
+
+
+def shard_for_user(user):
+    """
+    Return the database alias holding a user's events and tasks.
+
+    The shard map (ShardAssignment) is the source of truth. Users without an
+    entry are placed by user id and pinned on first use, so adding shards
+    later never strands existing data. Lookups are cached when a shared
+    cache is configured (settings.SHARED_CACHE); move_user() updates that
+    entry for every worker.
+    """
+    from .models import ShardAssignment
+
+    user_id = getattr(user, 'pk', user)
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+
+    key = shard_cache_key(user_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = (
+            ShardAssignment.objects.using('default')
+            .filter(user_id=user_id).values_list('shard', flat=True).first()
+        )
+        if alias is None:
+            assignment, _ = ShardAssignment.objects.using('default').get_or_create(
+                user_id=user_id, defaults={'shard': aliases[user_id % len(aliases)]}
+            )
+            alias = assignment.shard
+        cache.set(key, alias, SHARD_MAP_CACHE_TIMEOUT)
+    return alias
+
+
+class UserShardRouter:
+    """
+    Route Event, Task and their rollups to the owning user's shard; every
+    other model stays on "default".
+
+    Reads need a user to route on, so queries should go through
+    `Model.objects.for_user(user)`; saves and related managers are routed
+    from the instance hint.
+    """
+
+    def _shard_for_hints(self, hints):
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if is_sharded(instance):
+            # Unsaved rows are validated (e.g. by ModelForm) before they get an owner.
+            return shard_for_user(instance.user_id) if instance.user_id is not None else None
+        if instance._meta.label == settings.AUTH_USER_MODEL and instance.pk is not None:
+            # user.event_set and friends.
+            return shard_for_user(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if is_sharded(model):
+            return self._shard_for_hints(hints)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if is_sharded(model):
+            return self._shard_for_hints(hints)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows point at users in "default"; the FKs carry no DB constraint.
+        if is_sharded(obj1) or is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default':
+            return True
+        if db in shard_aliases():
+            return app_label == 'core' and model_name in SHARDED_MODELS
+        return None
+
+
+def seed_shard_sequences(alias):
+    """Start each sharded table's id sequence at its shard's block."""
+    offset = shard_aliases().index(alias) * SHARD_ID_BLOCK
+    if offset == 0:
+        return
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, offset])
+                elif row[0] < offset:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [offset, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM " + connection.ops.quote_name(table) + ")))",
+                    [table, offset],
+                )
+
+
+def move_user(user_id, target):
+    """
+    Copy a user's sharded rows to `target`, repoint the shard map and delete
+    the rows from the old shard. Primary keys are preserved.
+
+    The user's writes should be paused while this runs; anything written to
+    the old shard between the copy and the repoint would be lost.
+    """
+    from .models import ShardAssignment
+
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+
+    moved = 0
+    with transaction.atomic(using='default'), \
+            transaction.atomic(using=target), transaction.atomic(using=source):
+        for model in sharded_models():
+            rows = list(model._base_manager.using(source).filter(user_id=user_id))
+            model._base_manager.using(target).bulk_create(rows, batch_size=500)
+            moved += len(rows)
+        ShardAssignment.objects.using('default').update_or_create(
+            user_id=user_id, defaults={'shard': target}
+        )
+        # Publish the new shard only once the map row is committed, so no
+        # worker can re-cache the old alias in between.
+        transaction.on_commit(
+            lambda: cache.set(shard_cache_key(user_id), target, SHARD_MAP_CACHE_TIMEOUT),
+            using='default',
+        )
+        # _raw_delete() skips the rollup signals, which would now route to the target.
+        for model in sharded_models():
+            model._base_manager.using(source).filter(user_id=user_id)._raw_delete(source)
+    return moved
+
+
+def delete_user_data(user_id):
+    """Remove a user's rows from their shard; the cascade only reaches "default"."""
+    alias = shard_for_user(user_id)
+    if alias == 'default':
+        return
+    with transaction.atomic(using=alias):
+        for model in sharded_models():
+            model._base_manager.using(alias).filter(user_id=user_id)._raw_delete(alias)
@@ -0,0 +1,60 @@
+# core/signals.py
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .analytics import affected_dates, refresh_event_rollups, refresh_task_rollups, remember_rollup_fields, rollup_fields_changed
+from .images import schedule_profile_picture_variants
+from .middleware import invalidate_cached_user
+from .sharding import delete_user_data
+from .models import Event, Task, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def clear_cached_user(sender, instance, **kwargs):
+    # Covers password changes, settings/timezone saves and profile updates.
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def rebuild_profile_picture_variants(sender, instance, created, update_fields, **kwargs):
+    # Covers the settings page and the admin alike.
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if (instance.profile_picture.name or '') == (loaded.get('profile_picture') or ''):
+        return
+    schedule_profile_picture_variants(instance)
+    if hasattr(instance, '_loaded_values'):
+        loaded['profile_picture'] = instance.profile_picture.name
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_user_data(sender, instance, **kwargs):
+    # The delete cascade only follows relations inside "default".
+    delete_user_data(instance.pk)
+
+
+# Only these fields feed the rollups; title edits, version bumps and board
+# moves leave the rollup rows alone.
+EVENT_ROLLUP_FIELDS = ('start_time', 'end_time', 'event_type')
+TASK_ROLLUP_FIELDS = ('due_date', 'completed_at', 'priority')
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def update_event_rollups(sender, instance, signal, **kwargs):
+    if signal is post_save and not rollup_fields_changed(instance, EVENT_ROLLUP_FIELDS):
+        return
+    refresh_event_rollups(instance.user_id, affected_dates(instance, 'start_time'))
+    remember_rollup_fields(instance, EVENT_ROLLUP_FIELDS)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def update_task_rollups(sender, instance, signal, **kwargs):
+    if signal is post_save and not rollup_fields_changed(instance, TASK_ROLLUP_FIELDS):
+        return
+    refresh_task_rollups(instance.user_id, affected_dates(instance, 'due_date', 'completed_at'))
+    remember_rollup_fields(instance, TASK_ROLLUP_FIELDS)
@@ -0,0 +1,49 @@
+# core/storage.py
+
+import gzip
+import os
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+MIN_COMPRESS_SIZE = 512
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes ".gz" and ".br" siblings of
+    every hashed text asset during collectstatic, so they can be served
+    without compressing per request.
+    """
+
+    def stored_name(self, name):
+        # Until collectstatic has written a manifest (development, test runs)
+        # fall back to the plain name instead of raising.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = {
+            '.gz': gzip.compress(data, compresslevel=9, mtime=0),
+            '.br': brotli.compress(data),
+        }
+        for suffix, compressed in variants.items():
+            # Only keep a variant if it actually saves bytes.
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
@@ -1,3 +1,768 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import brotli
+
+from django.conf import settings as django_settings
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from PIL import Image
+
+from .admin import EstimatedCountPaginator
+from .concurrency import update_if_version
+from .holidays import clear_cache as clear_holiday_cache, holidays_between, load_region
+from .images import PROFILE_PICTURE_VARIANTS, VARIANT_DIR, VARIANT_NAME_RE, build_profile_picture_variants
+from .middleware import StaticFilesMiddleware, accepted_encodings, user_cache_key
+from .models import (
+    Event, EventRollup, Holiday, HolidayCalendar, RequestProfile, ShardAssignment, Task, TaskRollup, User,
+)
+from .profiling import is_requested, prune_profiles
+from .ranks import REBALANCE_LENGTH, rank_between, rebalance_column, spread_ranks
+from .sharding import UserShardRouter, shard_cache_key, shard_for_user
+from .storage import CompressedManifestStaticFilesStorage
+from .views import decode_event_cursor, encode_event_cursor
+
+
+class CalendryTestCase(TestCase):
+    # Sharded rows may live on any database; run the suite with
+    # CALENDRY_SHARDS=N to exercise N shards.
+    databases = '__all__'
+
+
+class CreateViewTests(CalendryTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw-Str0ng!x')
+        self.client.force_login(self.user)
+        self.start = timezone.now().replace(second=0, microsecond=0)
+
+    def event_data(self):
+        return {
+            'title': 'Standup',
+            'description': '',
+            'start_time': self.start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (self.start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            'event_type': 'meeting',
+            'color': '#3b82f6',
+            'location': '',
+        }
+
+    def test_create_event_api(self):
+        response = self.client.post(reverse('create_event'), self.event_data())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Event.objects.for_user(self.user).get().title, 'Standup')
+
+    def test_event_create_view(self):
+        response = self.client.post(reverse('event_create'), self.event_data())
+        self.assertRedirects(response, reverse('event_list'))
+        self.assertTrue(Event.objects.for_user(self.user).filter(title='Standup').exists())
+
+    def test_task_create(self):
+        response = self.client.post(reverse('task_create'), {
+            'title': 'Write report',
+            'description': '',
+            'due_date': self.start.strftime('%Y-%m-%dT%H:%M'),
+            'priority': 'high',
+            'status': 'todo',
+        })
+        self.assertRedirects(response, reverse('task_list'))
+        self.assertEqual(Task.objects.for_user(self.user).get().title, 'Write report')
+
+
+@override_settings(USER_SHARDS=['default', 'shard_x'])
+class ShardRoutingTests(CalendryTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bob', password='pw-Str0ng!x')
+        self.router = UserShardRouter()
+
+    def pin(self, alias):
+        ShardAssignment.objects.update_or_create(user=self.user, defaults={'shard': alias})
+        cache.delete(shard_cache_key(self.user.pk))
+
+    def test_new_user_is_placed_by_id_and_pinned(self):
+        expected = ['default', 'shard_x'][self.user.pk % 2]
+        self.assertEqual(shard_for_user(self.user), expected)
+        self.assertEqual(ShardAssignment.objects.get(user=self.user).shard, expected)
+        # Changing the shard list must not move users that are already placed.
+        with override_settings(USER_SHARDS=['default', 'shard_x', 'shard_y']):
+            cache.clear()
+            self.assertEqual(shard_for_user(self.user.pk), expected)
+
+    def test_for_user_reads_from_the_owners_shard(self):
+        self.pin('shard_x')
+        events = Event.objects.for_user(self.user)
+        self.assertEqual(events.db, 'shard_x')
+        self.assertIn(f'"user_id" = {self.user.pk}', str(events.query))
+        self.assertEqual(Task.objects.for_user(self.user.pk).db, 'shard_x')
+
+    def test_router_uses_the_instance_owner(self):
+        self.pin('shard_x')
+        event = Event(user=self.user)
+        self.assertEqual(self.router.db_for_write(Event, instance=event), 'shard_x')
+        self.assertEqual(self.router.db_for_read(User, instance=self.user), 'default')
+        self.assertEqual(self.router.db_for_read(HolidayCalendar), 'default')
+
+    def test_allow_relation_with_lazy_user(self):
+        lazy_user = SimpleLazyObject(lambda: self.user)
+        self.assertTrue(self.router.allow_relation(Event(user=self.user), lazy_user))
+        self.assertTrue(self.router.allow_relation(lazy_user, Task(user=self.user)))
+        self.assertIsNone(self.router.allow_relation(lazy_user, HolidayCalendar()))
+
+    def test_allow_migrate_keeps_only_sharded_models_on_shards(self):
+        self.assertTrue(self.router.allow_migrate('shard_x', 'core', 'event'))
+        self.assertTrue(self.router.allow_migrate('shard_x', 'core', 'taskrollup'))
+        self.assertFalse(self.router.allow_migrate('shard_x', 'core', 'user'))
+        self.assertFalse(self.router.allow_migrate('shard_x', 'auth', 'group'))
+        self.assertTrue(self.router.allow_migrate('default', 'core', 'event'))
+
+
+class RankTests(CalendryTestCase):
+    def test_rank_between_sorts_between_its_neighbours(self):
+        cases = [('', None), ('', 'i'), ('i', None), ('a', 'b'), ('az', 'b'), ('a', 'a1'), ('zz', None)]
+        for before, after in cases:
+            rank = rank_between(before, after)
+            self.assertGreater(rank, before)
+            if after is not None:
+                self.assertLess(rank, after)
+            self.assertFalse(rank.endswith('0'))
+
+    def test_repeated_inserts_keep_order(self):
+        ranks = [rank_between('', None)]
+        for i in range(200):
+            # Alternate between the top, the bottom and the middle of the list.
+            position = (0, len(ranks), len(ranks) // 2)[i % 3]
+            before = ranks[position - 1] if position else ''
+            after = ranks[position] if position < len(ranks) else None
+            ranks.insert(position, rank_between(before, after))
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), len(ranks))
+
+    def test_rank_between_rejects_out_of_order_neighbours(self):
+        with self.assertRaises(ValueError):
+            rank_between('b', 'a')
+        with self.assertRaises(ValueError):
+            rank_between('b', 'b')
+
+    def test_spread_ranks_are_sorted_and_short(self):
+        ranks = spread_ranks(1000)
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), 1000)
+        self.assertLessEqual(max(map(len, ranks)), 3)
+
+    def test_status_change_moves_task_to_end_of_new_column(self):
+        user = User.objects.create_user('carol', password='pw-Str0ng!x')
+        due = timezone.now()
+        doing = Task.objects.create(user=user, title='Doing', due_date=due, status='in_progress')
+        task = Task.objects.create(user=user, title='Todo', due_date=due, status='todo')
+        task = Task.objects.for_user(user).get(pk=task.pk)
+        task.status = 'in_progress'
+        task.sync_rank()
+        self.assertGreater(task.rank, doing.rank)
+
+    def test_board_breaks_rank_ties_by_id(self):
+        user = User.objects.create_user('quinn')
+        self.client.force_login(user)
+        due = timezone.now()
+        # Equal ranks, as two concurrent moves into the same gap produce.
+        first = Task.objects.create(user=user, title='B', due_date=due, rank='i')
+        second = Task.objects.create(user=user, title='A', due_date=due, rank='i')
+        column = self.client.get(reverse('task_board_data')).json()['todo']
+        self.assertEqual([task['id'] for task in column], [first.pk, second.pk])
+
+    def test_rebalance_column_keeps_order(self):
+        user = User.objects.create_user('dave', password='pw-Str0ng!x')
+        due = timezone.now()
+        for rank in ('c', 'czzzzzzzzzzzzzzz', 'd', 'i'):
+            Task.objects.create(user=user, title=rank, due_date=due, rank=rank)
+        self.assertTrue(rebalance_column(user.pk, 'todo'))
+        column = list(Task.objects.for_user(user).order_by('rank').values_list('title', 'rank'))
+        self.assertEqual([title for title, _ in column], ['c', 'czzzzzzzzzzzzzzz', 'd', 'i'])
+        self.assertTrue(all(len(rank) <= REBALANCE_LENGTH for _, rank in column))
+
+
+class OptimisticConcurrencyTests(CalendryTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('erin', password='pw-Str0ng!x')
+        self.client.force_login(self.user)
+        start = timezone.now().replace(second=0, microsecond=0)
+        self.event = Event.objects.create(
+            user=self.user, title='Review', start_time=start, end_time=start + timedelta(hours=1),
+        )
+
+    def load(self):
+        return Event.objects.for_user(self.user).get(pk=self.event.pk)
+
+    def test_update_if_version_writes_and_bumps_version(self):
+        event = self.load()
+        event.title = 'Design review'
+        self.assertTrue(update_if_version(event, 1))
+        self.assertEqual(event.version, 2)
+        self.assertEqual(self.load().title, 'Design review')
+        self.assertEqual(self.load().version, 2)
+
+    def test_update_if_version_rejects_a_stale_version(self):
+        first, second = self.load(), self.load()
+        first.title = 'First'
+        second.title = 'Second'
+        self.assertTrue(update_if_version(first, first.version))
+        self.assertFalse(update_if_version(second, second.version))
+        self.assertEqual(self.load().title, 'First')
+
+    def test_stale_save_still_bumps_version(self):
+        editor, stale = self.load(), self.load()
+        editor.title = 'Edited'
+        editor.save()
+        stale.title = 'Stale'
+        stale.save()
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(self.load().version, 3)
+        # A client holding the version from before either save must conflict.
+        self.assertFalse(update_if_version(self.load(), 2))
+
+    def test_update_event_api_returns_conflict(self):
+        self.load().save()
+        response = self.client.post(
+            reverse('update_event', args=[self.event.pk]),
+            json.dumps({'title': 'Late edit', 'version': 1}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['event']['version'], 2)
+        self.assertEqual(self.load().title, 'Review')
+
+    def test_update_event_api_parses_the_version(self):
+        url = reverse('update_event', args=[self.event.pk])
+        response = self.client.post(url, json.dumps({'title': 'Renamed', 'version': '1'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['event']['version'], 2)
+        response = self.client.post(url, json.dumps({'title': 'Bad', 'version': 'one'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.load().title, 'Renamed')
+
+    def test_task_update_with_stale_form_version_conflicts(self):
+        task = Task.objects.create(user=self.user, title='Draft', due_date=timezone.now())
+        task.save()
+        response = self.client.post(reverse('task_update', args=[task.pk]), {
+            'title': 'Overwritten',
+            'description': '',
+            'due_date': timezone.now().strftime('%Y-%m-%dT%H:%M'),
+            'priority': 'medium',
+            'status': 'todo',
+            'version': 1,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Task.objects.for_user(self.user).get(pk=task.pk).title, 'Draft')
+
+
+@override_settings(EVENTS_PAGE_SIZE=3)
+class EventCursorTests(CalendryTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('frank', password='pw-Str0ng!x')
+        self.client.force_login(self.user)
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        # Pairs of events share a start time, so ties are broken by id.
+        self.events = [
+            Event.objects.create(
+                user=self.user, title=f'Event {i}',
+                start_time=self.start + timedelta(hours=i // 2),
+                end_time=self.start + timedelta(hours=i // 2 + 1),
+            )
+            for i in range(8)
+        ]
+
+    def fetch(self, **params):
+        params.setdefault('start', (self.start - timedelta(days=1)).isoformat())
+        params.setdefault('end', (self.start + timedelta(days=1)).isoformat())
+        return self.client.get(reverse('get_events'), params)
+
+    def test_cursor_round_trip(self):
+        event = self.events[3]
+        self.assertEqual(decode_event_cursor(encode_event_cursor(event)), (event.start_time, event.id))
+
+    def test_pages_cover_every_event_once_in_order(self):
+        seen = []
+        response = self.fetch(paginate=1)
+        pages = 0
+        while True:
+            data = response.json()
+            self.assertLessEqual(len(data['events']), 3)
+            seen.extend(event['id'] for event in data['events'])
+            pages += 1
+            if data['next_cursor'] is None:
+                break
+            response = self.fetch(cursor=data['next_cursor'])
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [event.id for event in self.events])
+
+    def test_paginate_needs_a_true_value(self):
+        self.assertIsInstance(self.fetch(paginate=0).json(), list)
+        self.assertIsInstance(self.fetch(paginate='false').json(), list)
+        self.assertIn('next_cursor', self.fetch(paginate='true').json())
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_event_cursor('not a cursor')
+        self.assertEqual(self.fetch(cursor='not a cursor').status_code, 400)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    MIDDLEWARE=[
+        name.replace('django.contrib.auth.middleware.AuthenticationMiddleware',
+                     'core.middleware.CachedAuthenticationMiddleware')
+        for name in django_settings.MIDDLEWARE
+    ],
+)
+class CachedUserTests(CalendryTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('gina', password='pw-Str0ng!x')
+        self.client.force_login(self.user)
+        self.task = Task.objects.create(user=self.user, title='Ship', due_date=timezone.now())
+
+    def toggle(self):
+        return self.client.post(reverse('task_toggle', args=[self.task.pk]))
+
+    def test_cache_hit_does_no_user_query(self):
+        self.toggle()
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.toggle()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'core_user' in query['sql']])
+
+    def assert_save_drops_cached_user(self, change):
+        self.toggle()
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        change()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_password_change_drops_cached_user(self):
+        def change():
+            self.user.set_password('n3w-Str0ng!pw')
+            self.user.save()
+        self.assert_save_drops_cached_user(change)
+
+    def test_timezone_save_drops_cached_user(self):
+        self.assert_save_drops_cached_user(
+            lambda: self.client.post(reverse('settings'), {'timezone': 'Europe/Berlin'})
+        )
+        self.assertEqual(User.objects.get(pk=self.user.pk).timezone, 'Europe/Berlin')
+
+    def test_profile_save_drops_cached_user(self):
+        def change():
+            self.user.profile_picture = 'profile_pics/new.jpg'
+            self.user.save(update_fields=['profile_picture'])
+        self.assert_save_drops_cached_user(change)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginTests(CalendryTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hal', password='pw-Str0ng!x')
+
+    def test_login_hashes_password_once(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as checked:
+            response = self.client.post(reverse('login'), {'username': 'hal', 'password': 'pw-Str0ng!x'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(checked.call_count, 1)
+
+    def test_failed_login_hashes_password_once(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as checked:
+            response = self.client.post(reverse('login'), {'username': 'hal', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(checked.call_count, 1)
+
+    def test_login_upgrades_hash_iterations(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.client.post(reverse('login'), {'username': 'hal', 'password': 'pw-Str0ng!x'})
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$2000$'))
+
+
+class ScalableAdminTests(CalendryTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('ivy', 'ivy@example.com', 'pw-Str0ng!x')
+        self.client.force_login(self.admin)
+        self.owner = User.objects.create_user('jack')
+        self.other = User.objects.create_user('kate')
+        self.start = timezone.now().replace(second=0, microsecond=0)
+
+    def add_event(self, user, title, hours=0):
+        start = self.start + timedelta(hours=hours)
+        return Event.objects.create(user=user, title=title, start_time=start, end_time=start + timedelta(hours=1))
+
+    def changelist(self, **params):
+        response = self.client.get(reverse('admin:core_event_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_user_filter_lists_only_that_users_rows(self):
+        self.add_event(self.owner, 'Mine')
+        self.add_event(self.other, 'Theirs')
+        cl = self.changelist(user=self.owner.pk)
+        self.assertEqual([event.title for event in cl.result_list], ['Mine'])
+        self.assertEqual(cl.result_list[0]._owner_username, 'jack')
+
+    def test_newest_rows_come_first(self):
+        for hours in range(3):
+            self.add_event(self.owner, f'Event {hours}', hours)
+        cl = self.changelist(user=self.owner.pk)
+        self.assertEqual([event.title for event in cl.result_list], ['Event 2', 'Event 1', 'Event 0'])
+
+    def test_search_is_a_case_sensitive_title_prefix_or_id(self):
+        standup = self.add_event(self.owner, 'Standup')
+        self.add_event(self.owner, 'standup notes')
+        self.add_event(self.owner, 'Retro')
+        cl = self.changelist(user=self.owner.pk, q='Stand')
+        self.assertEqual([event.title for event in cl.result_list], ['Standup'])
+        cl = self.changelist(user=self.owner.pk, q=str(standup.pk))
+        self.assertEqual([event.pk for event in cl.result_list], [standup.pk])
+
+    @override_settings(ADMIN_COUNT_LIMIT=3)
+    def test_paginator_stops_counting_at_the_limit(self):
+        for hours in range(5):
+            self.add_event(self.owner, f'Event {hours}', hours)
+        events = Event.objects.for_user(self.owner).order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(events, 2).count, 3)
+        self.assertEqual(EstimatedCountPaginator(events.filter(title='Event 0'), 2).count, 1)
+
+    @skipUnless(len(django_settings.USER_SHARDS) > 1, "needs CALENDRY_SHARDS >= 2")
+    def test_change_page_finds_rows_on_other_shards(self):
+        ShardAssignment.objects.create(user=self.owner, shard=django_settings.USER_SHARDS[-1])
+        event = self.add_event(self.owner, 'Sharded')
+        self.assertEqual(event._state.db, django_settings.USER_SHARDS[-1])
+        response = self.client.get(reverse('admin:core_event_change', args=[event.pk]))
+        self.assertContains(response, 'Sharded')
+        cl = self.changelist(user=self.owner.pk)
+        self.assertEqual([row.title for row in cl.result_list], ['Sharded'])
+
+
+class RollupTests(CalendryTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('liam')
+        self.day = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0)
+
+    def event_rollups(self):
+        return sorted(
+            EventRollup.objects.for_user(self.user)
+            .values_list('date', 'event_type', 'event_count', 'duration_minutes')
+        )
+
+    def task_rollups(self):
+        return sorted(
+            TaskRollup.objects.for_user(self.user)
+            .values_list('date', 'priority', 'completed_count', 'open_due_count')
+        )
+
+    def test_event_moving_between_days(self):
+        event = Event.objects.create(
+            user=self.user, title='Planning', event_type='meeting',
+            start_time=self.day, end_time=self.day + timedelta(minutes=90),
+        )
+        self.assertEqual(self.event_rollups(), [(self.day.date(), 'meeting', 1, 90)])
+        event = Event.objects.for_user(self.user).get(pk=event.pk)
+        event.start_time += timedelta(days=1)
+        event.end_time += timedelta(days=1)
+        event.save()
+        self.assertEqual(self.event_rollups(), [(self.day.date() + timedelta(days=1), 'meeting', 1, 90)])
+        # Moving the same instance back must refresh the rollups again.
+        event.start_time -= timedelta(days=1)
+        event.end_time -= timedelta(days=1)
+        event.save()
+        self.assertEqual(self.event_rollups(), [(self.day.date(), 'meeting', 1, 90)])
+
+    def test_event_delete_clears_its_rollup(self):
+        event = Event.objects.create(
+            user=self.user, title='Call', start_time=self.day, end_time=self.day + timedelta(hours=1),
+        )
+        event.delete()
+        self.assertEqual(self.event_rollups(), [])
+
+    def test_completing_and_reopening_a_task(self):
+        task = Task.objects.create(user=self.user, title='Report', due_date=self.day, priority='high')
+        self.assertEqual(self.task_rollups(), [(self.day.date(), 'high', 0, 1)])
+        task = Task.objects.for_user(self.user).get(pk=task.pk)
+        task.completed = True
+        task.save()
+        today = timezone.localdate(task.completed_at)
+        self.assertEqual(self.task_rollups(), [(today, 'high', 1, 0)])
+        task.completed = False
+        task.save()
+        self.assertEqual(self.task_rollups(), [(self.day.date(), 'high', 0, 1)])
+        task.delete()
+        self.assertEqual(self.task_rollups(), [])
+
+    def test_overdue_report_counts_open_tasks_by_priority(self):
+        self.client.force_login(self.user)
+        past = self.day - timedelta(days=3)
+        Task.objects.create(user=self.user, title='Late', due_date=past, priority='high')
+        Task.objects.create(user=self.user, title='Late too', due_date=past, priority='high')
+        Task.objects.create(user=self.user, title='Done', due_date=past, priority='low', completed=True)
+        Task.objects.create(user=self.user, title='Upcoming', due_date=self.day + timedelta(days=3))
+        response = self.client.get(reverse('task_throughput_report'))
+        self.assertEqual(response.json()['overdue_by_priority'], {'high': 2})
+
+    def test_edits_outside_rollup_fields_skip_the_refresh(self):
+        task = Task.objects.create(user=self.user, title='Draft', due_date=self.day)
+        task = Task.objects.for_user(self.user).get(pk=task.pk)
+        task.title = 'Final'
+        task.rank = 'x'
+        with CaptureQueriesContext(connections[task._state.db]) as queries:
+            task.save()
+        self.assertFalse([query for query in queries if 'core_taskrollup' in query['sql']])
+
+
+class HolidayTests(CalendryTestCase):
+    def setUp(self):
+        clear_holiday_cache()
+        self.addCleanup(clear_holiday_cache)
+        load_region('NG', {'name': 'Nigeria', 'holidays': [
+            ['2026-01-01', "New Year's Day"], ['2026-10-01', 'Independence Day'],
+        ]})
+        load_region('GB', {'name': 'United Kingdom', 'holidays': [
+            ['2026-01-01', "New Year's Day"], ['2026-12-25', 'Christmas Day'],
+        ]})
+        self.user = User.objects.create_user('mia', holiday_calendars=['NG'])
+        self.client.force_login(self.user)
+
+    def test_holidays_between_filters_by_region_and_date(self):
+        found = holidays_between(['GB', 'NG'], date(2026, 1, 1), date(2026, 10, 1))
+        self.assertEqual(found, [
+            ('GB', date(2026, 1, 1), "New Year's Day"),
+            ('NG', date(2026, 1, 1), "New Year's Day"),
+            ('NG', date(2026, 10, 1), 'Independence Day'),
+        ])
+        self.assertEqual(holidays_between(['NG'], date(2026, 1, 2), date(2026, 9, 30)), [])
+        self.assertEqual(holidays_between(['XX'], date(2026, 1, 1), date(2026, 12, 31)), [])
+
+    def test_process_cache_expires(self):
+        holidays_between(['NG'], date(2026, 1, 1), date(2026, 12, 31))
+        # Written by another process: this one keeps its copy until it expires.
+        Holiday.objects.create(calendar=HolidayCalendar.objects.get(region='NG'),
+                               date=date(2026, 6, 12), name='Democracy Day')
+        self.assertEqual(len(holidays_between(['NG'], date(2026, 1, 1), date(2026, 12, 31))), 2)
+        with override_settings(HOLIDAY_CACHE_TIMEOUT=0):
+            self.assertEqual(len(holidays_between(['NG'], date(2026, 1, 1), date(2026, 12, 31))), 3)
+
+    def window(self, **params):
+        return {'start': '2025-12-01', 'end': '2026-02-01', **params}
+
+    def test_get_events_merges_subscribed_holidays(self):
+        data = self.client.get(reverse('get_events'), self.window()).json()
+        self.assertEqual([(item['type'], item['title']) for item in data], [('holiday', "New Year's Day")])
+        self.assertFalse(data[0]['editable'])
+
+    def test_paginated_events_return_holidays_on_the_first_page(self):
+        start = timezone.make_aware(datetime(2026, 1, 5, 9))
+        for hours in range(3):
+            Event.objects.create(user=self.user, title=f'Event {hours}',
+                                 start_time=start + timedelta(hours=hours),
+                                 end_time=start + timedelta(hours=hours + 1))
+        first = self.client.get(reverse('get_events'), self.window(paginate=1, limit=2)).json()
+        self.assertEqual([item['title'] for item in first['holidays']], ["New Year's Day"])
+        second = self.client.get(reverse('get_events'), self.window(cursor=first['next_cursor'])).json()
+        self.assertNotIn('holidays', second)
+        self.assertEqual([item['title'] for item in second['events']], ['Event 2'])
+
+    def test_stream_includes_holidays(self):
+        response = self.client.get(reverse('stream_events'), self.window())
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([item['type'] for item in lines], ['holiday'])
+
+
+class ProfilePictureTests(CalendryTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('noah')
+
+    def upload(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (600, 400), color).save(buffer, 'PNG')
+        return SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+
+    def set_picture(self, color):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile_picture = self.upload(color)
+        with mock.patch('core.signals.schedule_profile_picture_variants') as schedule:
+            user.save()
+        schedule.assert_called_once_with(user)
+        build_profile_picture_variants(user.pk)
+        return User.objects.get(pk=user.pk)
+
+    def test_build_writes_hashed_variants(self):
+        user = self.set_picture('red')
+        for field, size in PROFILE_PICTURE_VARIANTS.items():
+            name = getattr(user, field).name
+            self.assertTrue(VARIANT_NAME_RE.fullmatch(name.removeprefix(VARIANT_DIR)))
+            with default_storage.open(name) as f:
+                self.assertEqual(Image.open(f).size, (size, size))
+
+    def test_new_picture_replaces_old_variants(self):
+        old = self.set_picture('red').profile_avatar.name
+        new = self.set_picture('blue').profile_avatar.name
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
+
+    def test_other_saves_do_not_rebuild(self):
+        user = self.set_picture('red')
+        with mock.patch('core.signals.schedule_profile_picture_variants') as schedule:
+            user.timezone = 'Europe/Paris'
+            user.save()
+            user.save(update_fields=['timezone'])
+        schedule.assert_not_called()
+
+    def test_variant_view_serves_only_variant_names(self):
+        name = self.set_picture('red').profile_thumbnail.name.removeprefix(VARIANT_DIR)
+        response = self.client.get(reverse('profile_picture_variant', args=[name]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        for bad in ('..', '.', 'me.png', '1-64-zzzzzzzzzzzzzzzz.jpg'):
+            self.assertEqual(self.client.get(f'/media/profile_pics/variants/{bad}').status_code, 404)
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        css = b'body { color: #333; }\n' * 100
+        files = {
+            'app.css': css,
+            'app.0123456789ab.css': css,
+            'app.0123456789ab.css.gz': gzip.compress(css),
+            'app.0123456789ab.css.br': brotli.compress(css),
+            'staticfiles.json': json.dumps({'version': '1.1', 'paths': {'app.css': 'app.0123456789ab.css'}}).encode(),
+        }
+        for name, data in files.items():
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(data)
+        override = override_settings(STATIC_ROOT=self.root, STATIC_URL='/static/')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('app'))
+
+    def get(self, name, accept_encoding=None):
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding is not None else {}
+        return self.middleware(RequestFactory().get('/static/' + name, **headers))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, br;q=0.5, *;q=0'), {'gzip': 1.0, 'br': 0.5, '*': 0.0})
+        self.assertEqual(accepted_encodings(''), {})
+        self.assertEqual(accepted_encodings('br;q=bogus'), {'br': 0.0})
+
+    def test_encoding_follows_q_values(self):
+        cases = [
+            ('gzip, deflate, br', 'br'),
+            ('gzip', 'gzip'),
+            ('gzip, br;q=0', 'gzip'),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('*', 'br'),
+            ('gzip;q=0, br;q=0', None),
+            ('', None),
+        ]
+        for header, encoding in cases:
+            with self.subTest(header=header):
+                response = self.get('app.0123456789ab.css', header)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertEqual(response['Content-Type'], 'text/css')
+
+    def test_cache_control(self):
+        self.assertEqual(self.get('app.0123456789ab.css')['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.get('app.css')['Cache-Control'], 'public, max-age=60')
+
+    def test_unknown_and_compressed_paths_fall_through(self):
+        self.assertEqual(self.get('missing.css').content, b'app')
+        self.assertEqual(self.get('app.0123456789ab.css.gz').content, b'app')
+
+    def test_storage_writes_gzip_and_brotli(self):
+        storage = CompressedManifestStaticFilesStorage(location=self.root)
+        os.remove(os.path.join(self.root, 'app.0123456789ab.css.gz'))
+        os.remove(os.path.join(self.root, 'app.0123456789ab.css.br'))
+        storage.compress('app.0123456789ab.css')
+        path = os.path.join(self.root, 'app.0123456789ab.css')
+        with open(path, 'rb') as f:
+            original = f.read()
+        with open(path + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), original)
+        with open(path + '.br', 'rb') as f:
+            self.assertEqual(brotli.decompress(f.read()), original)
+
+
+class ProfilingTests(CalendryTestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('olive', is_staff=True)
+        self.client.force_login(self.staff)
+        Task.objects.create(user=self.staff, title='Profiled', due_date=timezone.now())
+
+    def test_is_requested(self):
+        for value in ('1', 'true', 'TRUE', ' yes ', 'on'):
+            self.assertTrue(is_requested(value), value)
+        for value in (None, '', '0', 'false', 'no', 'off', 'maybe'):
+            self.assertFalse(is_requested(value), value)
+
+    def test_staff_request_stores_a_profile_with_its_sql(self):
+        response = self.client.get(reverse('task_list'), {'profile': '1'})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.user, profile.method, profile.status_code), (self.staff, 'GET', 200))
+        self.assertTrue(profile.path.startswith(reverse('task_list')))
+        self.assertTrue(any('core_task' in query['sql'] for query in profile.sql_queries))
+        response = self.client.get(reverse('profile_flamegraph', args=[profile.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_header_trigger(self):
+        response = self.client.get(reverse('task_list'), HTTP_X_CALENDRY_PROFILE='true')
+        self.assertIn('X-Profile-Id', response)
+
+    def test_false_values_and_non_staff_are_not_profiled(self):
+        self.client.get(reverse('task_list'), {'profile': '0'})
+        self.client.get(reverse('task_list'), HTTP_X_CALENDRY_PROFILE='false')
+        self.client.force_login(User.objects.create_user('pete'))
+        response = self.client.get(reverse('task_list'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_sample_rate(self):
+        self.client.get(reverse('task_list'), {'profile': '1'})
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_MAX_PROFILES=2)
+    def test_stored_profiles_are_capped(self):
+        ids = [int(self.client.get(reverse('task_list'), {'profile': '1'})['X-Profile-Id']) for _ in range(3)]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('pk', flat=True)), ids[1:])
+
+    def test_prune_profiles(self):
+        for _ in range(3):
+            RequestProfile.objects.create(method='GET', path='/', status_code=200, duration_ms=1)
+        RequestProfile.objects.filter(pk=RequestProfile.objects.order_by('pk').first().pk).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        self.assertEqual(prune_profiles(5, older_than=timezone.now() - timedelta(days=7)), 1)
+        self.assertEqual(prune_profiles(1), 1)
+        self.assertEqual(RequestProfile.objects.count(), 1)
+        call_command('prune_profiles', keep=0, stdout=StringIO())
+        self.assertFalse(RequestProfile.objects.exists())
@@ -4,18 +4,35 @@
 
 from core.models import Event
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from .models import Event, User, Task
-from .forms import CustomUserCreationForm, LoginForm, EventForm, TaskForm
+from .models import Event, User, Task, EventRollup, TaskRollup, RequestProfile
+from .profiling import build_call_tree, is_requested
+from .holidays import available_calendars, holidays_between
+from .ranks import REBALANCE_LENGTH, rank_between, schedule_rebalance
+from .concurrency import update_if_version
+from .forms import CustomUserCreationForm, LoginForm, EventForm, TaskForm, ProfilePictureForm
+from .images import VARIANT_DIR, VARIANT_NAME_RE
 from datetime import datetime, timedelta
+from itertools import chain
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
+from django.core.files.storage import default_storage
+from django.views.decorators.http import require_GET
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.conf import settings as django_settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Sum
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models.functions import TruncWeek
+from django.utils import timezone as dj_timezone
+import base64
 import json
 import pytz
 
@@ -44,14 +61,13 @@ def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f"Welcome back, {user.username}!")
-                next_url = request.POST.get('next', request.GET.get('next', 'dashboard'))
-                return redirect(next_url)
+            # AuthenticationForm.clean() has already run authenticate(), so
+            # reuse its user instead of hashing the password a second time.
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f"Welcome back, {user.username}!")
+            next_url = request.POST.get('next', request.GET.get('next', 'dashboard'))
+            return redirect(next_url)
         messages.error(request, "Invalid username or password.")
     else:
         form = LoginForm()
@@ -66,16 +82,21 @@ def logout_view(request):
 def dashboard(request):
     if request.user.is_authenticated:
         today = datetime.now().date()
-        events = Event.objects.filter(user=request.user, start_time__date=today)
-        tasks = Task.objects.filter(user=request.user, due_date__date=today)
+        events = Event.objects.for_user(request.user).filter(start_time__date=today)
+        tasks = Task.objects.for_user(request.user).filter(due_date__date=today)
+        upcoming_holidays = holidays_between(
+            request.user.holiday_calendars, today, today + timedelta(days=30)
+        )
         return render(request, 'core/dashboard.html', {
+            'today_holidays': [name for _, date, name in upcoming_holidays if date == today],
+            'upcoming_holidays': [(date, name) for _, date, name in upcoming_holidays if date > today][:5],
             'events': events,
             'tasks': tasks,
             'today': today,
             'today_events': events,
-            'pending_tasks': Task.objects.filter(user=request.user, completed=False),
-            'upcoming_events': Event.objects.filter(user=request.user, start_time__date__gte=today).exclude(start_time__date=today)[:5],
-            'recent_tasks': Task.objects.filter(user=request.user).order_by('-created_at')[:5]
+            'pending_tasks': Task.objects.for_user(request.user).filter(completed=False),
+            'upcoming_events': Event.objects.for_user(request.user).filter(start_time__date__gte=today).exclude(start_time__date=today)[:5],
+            'recent_tasks': Task.objects.for_user(request.user).order_by('-created_at')[:5]
         })
     return render(request, 'core/dashboard.html')
 
@@ -83,31 +104,156 @@ def dashboard(request):
 def calendar_view(request):
     return render(request, 'core/calendar.html')
 
-@login_required
-def get_events(request):
+def parse_event_window(request):
+    """
+    Parse the ?start=&end= window of an events request and enforce
+    EVENTS_MAX_WINDOW_DAYS, so no single request can load years of history.
+    """
     start = request.GET.get('start')
     end = request.GET.get('end')
-    
-    events = Event.objects.filter(
-        user=request.user,
+    if not start or not end:
+        raise ValueError("start and end are required")
+    start = parse_event_datetime(start)
+    end = parse_event_datetime(end)
+    if start is None or end is None:
+        raise ValueError("start and end must be ISO 8601 dates or datetimes")
+    if start > end:
+        raise ValueError("start must not be after end")
+    if end - start > timedelta(days=django_settings.EVENTS_MAX_WINDOW_DAYS):
+        raise ValueError(f"window may not exceed {django_settings.EVENTS_MAX_WINDOW_DAYS} days")
+    return start, end
+
+def parse_event_datetime(value):
+    # FullCalendar sends "2025-08-01T00:00:00+01:00"; a bare date is also accepted.
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            return None
+        parsed = datetime.combine(parsed_date, datetime.min.time())
+    if dj_timezone.is_naive(parsed):
+        parsed = dj_timezone.make_aware(parsed)
+    return parsed
+
+def serialize_event(event):
+    return {
+        'id': event.id,
+        'title': event.title,
+        'start': event.start_time.isoformat(),
+        'end': event.end_time.isoformat(),
+        'description': event.description,
+        'type': event.event_type,
+        'allDay': event.is_all_day,
+        'color': get_event_color(event.event_type),
+        'version': event.version
+    }
+
+def serialize_holiday(region, date, name):
+    # Holidays come from shared, read-only calendars, not the user's events.
+    return {
+        'id': f'holiday-{region}-{date.isoformat()}',
+        'title': name,
+        'start': date.isoformat(),
+        'allDay': True,
+        'type': 'holiday',
+        'editable': False,
+        'color': get_event_color('holiday')
+    }
+
+def encode_event_cursor(event):
+    raw = f"{event.start_time.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_event_cursor(cursor):
+    try:
+        start_time, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        start_time = parse_datetime(start_time)
+        event_id = int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        start_time = None
+    if start_time is None:
+        raise ValueError("invalid cursor")
+    return start_time, event_id
+
+def window_events(request, start, end):
+    return Event.objects.for_user(request.user).filter(
         start_time__gte=start,
         end_time__lte=end
-    )
+    ).order_by('start_time', 'id')
+
+def window_holidays(request, start, end):
+    # Served from the in-process holiday cache; FullCalendar's end is exclusive.
+    return [serialize_holiday(*holiday) for holiday in holidays_between(
+        request.user.holiday_calendars,
+        dj_timezone.localdate(start),
+        dj_timezone.localdate(end - timedelta(microseconds=1)),
+    )]
+
+@login_required
+def get_events(request):
+    """
+    Events in a window, as a plain list (what FullCalendar expects) or, when
+    ?paginate=1 or ?cursor= is given, as keyset pages of at most
+    EVENTS_PAGE_SIZE events ordered by (start_time, id). Subscribed holidays
+    are merged into the list, or returned once under "holidays" on the first
+    page.
+    """
+    try:
+        start, end = parse_event_window(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     
-    event_data = []
-    for event in events:
-        event_data.append({
-            'id': event.id,
-            'title': event.title,
-            'start': event.start_time.isoformat(),
-            'end': event.end_time.isoformat(),
-            'description': event.description,
-            'type': event.event_type,
-            'allDay': event.is_all_day,
-            'color': get_event_color(event.event_type)
-        })
+    events = window_events(request, start, end)
+    cursor = request.GET.get('cursor')
+    if not cursor and not is_requested(request.GET.get('paginate')):
+        event_data = [serialize_event(event) for event in events]
+        event_data.extend(window_holidays(request, start, end))
+        return JsonResponse(event_data, safe=False)
     
-    return JsonResponse(event_data, safe=False)
+    page_size = django_settings.EVENTS_PAGE_SIZE
+    try:
+        page_size = min(int(request.GET.get('limit', page_size)), page_size)
+    except ValueError:
+        pass
+    page_size = max(page_size, 1)
+    if cursor:
+        try:
+            after_time, after_id = decode_event_cursor(cursor)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        events = events.filter(
+            Q(start_time__gt=after_time) | Q(start_time=after_time, id__gt=after_id)
+        )
+    
+    page = list(events[:page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    data = {
+        'events': [serialize_event(event) for event in page],
+        'next_cursor': encode_event_cursor(page[-1]) if has_more else None,
+    }
+    if not cursor:
+        data['holidays'] = window_holidays(request, start, end)
+    return JsonResponse(data)
+
+@login_required
+@require_GET
+def stream_events(request):
+    """
+    Newline-delimited JSON of a window's subscribed holidays followed by its
+    events, which are read from the DB in chunks.
+    """
+    try:
+        start, end = parse_event_window(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    events = window_events(request, start, end).iterator(
+        chunk_size=django_settings.EVENTS_STREAM_CHUNK_SIZE
+    )
+    items = chain(window_holidays(request, start, end), map(serialize_event, events))
+    lines = (json.dumps(item, cls=DjangoJSONEncoder) + '\n' for item in items)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
 def get_event_color(event_type):
     colors = {
@@ -135,7 +281,8 @@ def create_event(request):
                 'start': event.start_time.isoformat(),
                 'end': event.end_time.isoformat(),
                 'color': event.color,
-                'type': event.event_type
+                'type': event.event_type,
+                'version': event.version
             }
         })
     return JsonResponse({
@@ -145,7 +292,7 @@ def create_event(request):
         # ... error handling ...
 
 def task_list(request):
-    tasks = Task.objects.filter(user=request.user)
+    tasks = Task.objects.for_user(request.user)
     total_tasks = tasks.count()
     completed_tasks = tasks.filter(completed=True).count()
     completion_percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
@@ -157,6 +304,71 @@ def task_list(request):
         'completion_percentage': completion_percentage
     })
 
+def board_columns(user):
+    """All of a user's tasks grouped by status, read with one (user, status, rank) index scan."""
+    # Concurrent moves into the same gap can produce equal ranks; id keeps their order stable.
+    tasks = Task.objects.for_user(user).order_by('status', 'rank', 'id').only(
+        'id', 'title', 'due_date', 'priority', 'status', 'rank', 'completed'
+    )
+    columns = {status: [] for status, _ in Task.STATUS_CHOICES}
+    for task in tasks:
+        columns[task.status].append(task)
+    return columns
+
+@login_required
+def task_board(request):
+    columns = board_columns(request.user)
+    return render(request, 'core/task_board.html', {
+        'columns': [(status, label, columns[status]) for status, label in Task.STATUS_CHOICES],
+    })
+
+@login_required
+@require_GET
+def task_board_data(request):
+    columns = board_columns(request.user)
+    return JsonResponse({
+        status: [{
+            'id': task.id,
+            'title': task.title,
+            'due': task.due_date.isoformat(),
+            'priority': task.priority,
+            'rank': task.rank,
+        } for task in tasks]
+        for status, tasks in columns.items()
+    })
+
+@require_POST
+@login_required
+def task_move(request, task_id):
+    """
+    Move a task to `status`, between the tasks `after_id` (above) and
+    `before_id` (below). Only the moved row is written.
+    """
+    tasks = Task.objects.for_user(request.user)
+    task = get_object_or_404(tasks, id=task_id)
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+    
+    status = data.get('status', task.status)
+    if status not in dict(Task.STATUS_CHOICES):
+        return JsonResponse({'status': 'error', 'message': 'Unknown status'}, status=400)
+    neighbour_ids = [pk for pk in (data.get('after_id'), data.get('before_id')) if pk]
+    neighbours = dict(tasks.filter(id__in=neighbour_ids, status=status).values_list('id', 'rank'))
+    above = neighbours.get(data.get('after_id'), '')
+    below = neighbours.get(data.get('before_id'))
+    try:
+        task.rank = rank_between(above, below)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Neighbours are out of order'}, status=409)
+    
+    task.status = status
+    task.save(update_fields=['status', 'rank', 'completed_at', 'updated_at'])
+    if len(task.rank) > REBALANCE_LENGTH:
+        schedule_rebalance(request.user.pk, status)
+    return JsonResponse({'status': 'success', 'task': {'id': task.id, 'status': task.status, 'rank': task.rank}})
+
 @login_required
 def task_create(request):
     if request.method == 'POST':
@@ -172,19 +384,29 @@ def task_create(request):
 
 @login_required
 def task_update(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), id=task_id)
     if request.method == 'POST':
+        loaded_version = task.version
         form = TaskForm(request.POST, instance=task)
         if form.is_valid():
-            form.save()
-            return redirect('task_list')
+            task = form.save(commit=False)
+            task.sync_rank()
+            task.sync_completed_at()
+            if update_if_version(task, form.cleaned_data['version'] or loaded_version):
+                return redirect('task_list')
+            # Someone else saved first: show their version instead of overwriting it.
+            current = get_object_or_404(Task.objects.for_user(request.user), id=task_id)
+            return render(request, 'core/task_form.html', {
+                'form': TaskForm(instance=current),
+                'conflict': True,
+            }, status=409)
     else:
         form = TaskForm(instance=task)
     return render(request, 'core/task_form.html', {'form': form})
 
 @login_required
 def task_delete(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), id=task_id)
     if request.method == 'POST':
         task.delete()
         return redirect('task_list')
@@ -192,29 +414,58 @@ def task_delete(request, task_id):
 
 @login_required
 def task_toggle(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), id=task_id)
     if request.method == 'POST':
         task.completed = not task.completed
-        task.save()
+        task.sync_completed_at()
+        if not update_if_version(task, task.version):
+            return JsonResponse({'status': 'conflict', 'message': 'The task was changed by another request.'}, status=409)
         return JsonResponse({'status': 'success', 'completed': task.completed})
     return JsonResponse({'status': 'error'})
 
 @login_required
 def settings(request):
     if request.method == 'POST':
+        if 'profile_picture' in request.FILES:
+            form = ProfilePictureForm(request.POST, request.FILES, instance=request.user)
+            if not form.is_valid():
+                messages.error(request, "Please upload a valid image.")
+                return redirect('settings')
+            # Saving a new picture schedules its variants (core.signals).
+            form.save()
         timezone = request.POST.get('timezone')
         if timezone:
             request.user.timezone = timezone
-            request.user.save()
-            return redirect('settings')
+        regions = dict(available_calendars())
+        request.user.holiday_calendars = [
+            region for region in request.POST.getlist('holiday_calendars') if region in regions
+        ]
+        # Only write the fields edited here: the variant worker may already
+        # have stored new profile picture variants on this row.
+        request.user.save(update_fields=['timezone', 'holiday_calendars'])
+        return redirect('settings')
     return render(request, 'core/settings.html', {
-        'timezones': pytz.all_timezones
+        'timezones': pytz.all_timezones,
+        'holiday_calendars': available_calendars(),
     })
 
+@require_GET
+def profile_picture_variant(request, name):
+    # Variant names contain a hash of their content, so they never change
+    # and can be cached by browsers and proxies for a year.
+    if not VARIANT_NAME_RE.fullmatch(name):
+        raise Http404
+    path = VARIANT_DIR + name
+    if not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 # core/views.py
 @login_required
 def task_delete(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), id=task_id)
     
     if request.method == 'POST':
         task.delete()
@@ -223,19 +474,109 @@ def task_delete(request, task_id):
     return render(request, 'core/confirm_delete.html', {'object': task})
 
 
+def get_report_range(request, default_weeks=12):
+    """Parse ?start=YYYY-MM-DD&end=YYYY-MM-DD, defaulting to the last few weeks."""
+    today = dj_timezone.localdate()
+    end = request.GET.get('end')
+    start = request.GET.get('start')
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else today
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(weeks=default_weeks)
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start, end
+
+@login_required
+@require_GET
+def time_usage_report(request):
+    try:
+        start, end = get_report_range(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    weeks = (
+        EventRollup.objects.for_user(request.user)
+        .filter(date__range=(start, end))
+        .annotate(week=TruncWeek('date'))
+        .values('week', 'event_type')
+        .annotate(minutes=Sum('duration_minutes'), events=Sum('event_count'))
+        .order_by('week', 'event_type')
+    )
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'weeks': [{
+            'week': row['week'].isoformat(),
+            'type': row['event_type'],
+            'hours': round(row['minutes'] / 60, 2),
+            'events': row['events'],
+        } for row in weeks]
+    })
+
+@login_required
+@require_GET
+def task_throughput_report(request):
+    try:
+        start, end = get_report_range(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    rollups = TaskRollup.objects.for_user(request.user)
+    completed = (
+        rollups
+        .filter(date__range=(start, end), completed_count__gt=0)
+        .annotate(week=TruncWeek('date'))
+        .values('week')
+        .annotate(done=Sum('completed_count'))
+        .order_by('week')
+    )
+    # Open tasks due on any earlier day are overdue.
+    overdue = (
+        rollups
+        .filter(date__lt=dj_timezone.localdate(), open_due_count__gt=0)
+        .values('priority')
+        .annotate(count=Sum('open_due_count'))
+        .order_by('priority')
+    )
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'completed_per_week': [
+            {'week': row['week'].isoformat(), 'done': row['done']} for row in completed
+        ],
+        'overdue_by_priority': {row['priority']: row['count'] for row in overdue},
+    })
+
 @require_POST
 @login_required
 def update_event(request, event_id):
     try:
-        event = get_object_or_404(Event, id=event_id, user=request.user)
+        event = get_object_or_404(Event.objects.for_user(request.user), id=event_id)
         data = json.loads(request.body) if request.body else {}
+        try:
+            expected_version = int(data.get('version', event.version))
+        except (TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'message': 'Invalid version'}, status=400)
         
         event.title = data.get('title', event.title)
         event.start_time = data.get('start_time', event.start_time)
         event.end_time = data.get('end_time', event.end_time)
         event.event_type = data.get('event_type', event.event_type)
         event.description = data.get('description', event.description)
-        event.save()
+        for field in ('start_time', 'end_time'):
+            value = getattr(event, field)
+            if isinstance(value, str):
+                value = parse_event_datetime(value)
+                if value is None:
+                    return JsonResponse({'status': 'error', 'message': f'Invalid {field}'}, status=400)
+                setattr(event, field, value)
+        
+        if not update_if_version(event, expected_version):
+            current = get_object_or_404(Event.objects.for_user(request.user), id=event_id)
+            return JsonResponse({
+                'status': 'conflict',
+                'message': 'The event was changed by another request.',
+                'event': serialize_event(current)
+            }, status=409)
         
         return JsonResponse({
             'status': 'success',
@@ -244,7 +585,8 @@ def update_event(request, event_id):
                 'title': event.title,
                 'start': event.start_time.isoformat(),
                 'end': event.end_time.isoformat(),
-                'type': event.event_type
+                'type': event.event_type,
+                'version': event.version
             }
         })
     except Exception as e:
@@ -254,7 +596,7 @@ def update_event(request, event_id):
 @login_required
 def delete_event(request, event_id):
     try:
-        event = get_object_or_404(Event, id=event_id, user=request.user)
+        event = get_object_or_404(Event.objects.for_user(request.user), id=event_id)
         event.delete()
         return JsonResponse({'status': 'success'})
     except Exception as e:
@@ -268,7 +610,7 @@ class EventListView(ListView):
     context_object_name = 'events'
 
     def get_queryset(self):
-        return Event.objects.filter(user=self.request.user)
+        return Event.objects.for_user(self.request.user)
 
 class EventCreateView(CreateView):
     model = Event
@@ -287,7 +629,17 @@ class EventUpdateView(UpdateView):
     success_url = reverse_lazy('event_list')
 
     def get_queryset(self):
-        return Event.objects.filter(user=self.request.user)
+        return Event.objects.for_user(self.request.user)
+    
+    def form_valid(self, form):
+        event = form.save(commit=False)
+        if update_if_version(event, form.cleaned_data['version'] or self.object.version):
+            return redirect(self.success_url)
+        # Someone else saved first: show their version instead of overwriting it.
+        current = get_object_or_404(self.get_queryset(), pk=event.pk)
+        return self.render_to_response(
+            self.get_context_data(form=EventForm(instance=current), conflict=True), status=409
+        )
 
 class EventDeleteView(DeleteView):
     model = Event
@@ -295,4 +647,46 @@ class EventDeleteView(DeleteView):
     success_url = reverse_lazy('event_list')
 
     def get_queryset(self):
-        return Event.objects.filter(user=self.request.user)    
\ No newline at end of file
+        return Event.objects.for_user(self.request.user)
+
+
+@staff_member_required
+def profile_list(request):
+    profiles = RequestProfile.objects.select_related('user').defer('collapsed_stacks', 'sql_queries')[:100]
+    return render(request, 'core/profiles.html', {'profiles': profiles})
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    profile = get_object_or_404(RequestProfile, id=profile_id)
+    tree = build_call_tree(profile.collapsed_stacks)
+    
+    # Flatten the call tree for display, hiding frames under 1% of the samples.
+    rows = []
+    threshold = max(tree['samples'] // 100, 1)
+    pending = [(child, 0) for child in reversed(tree['children'])]
+    while pending:
+        node, depth = pending.pop()
+        if node['samples'] < threshold:
+            continue
+        rows.append({
+            'name': node['name'],
+            'depth': depth,
+            'indent': depth * 12,
+            'samples': node['samples'],
+            'percent': node['samples'] * 100 / tree['samples'],
+        })
+        pending.extend((child, depth + 1) for child in reversed(node['children']))
+    
+    return render(request, 'core/profile_detail.html', {
+        'profile': profile,
+        'call_tree': rows,
+        'total_samples': tree['samples'],
+    })
+
+@staff_member_required
+def profile_flamegraph(request, profile_id):
+    # Collapsed-stack format, readable by flamegraph.pl, speedscope and inferno.
+    profile = get_object_or_404(RequestProfile, id=profile_id)
+    response = HttpResponse(profile.collapsed_stacks + '\n', content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="profile-{profile.id}.folded"'
+    return response